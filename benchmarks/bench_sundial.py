@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Benchmark the stages of Sundial.effect on synthetic sun path CSVs.
+
+The CSVs are generated in the format of sunearthtools.com ("coo:" header,
+date column, "A hh:mm:ss"/"E hh:mm:ss" column pairs) from sun_path().
+Every stage is timed on its own, then the pipeline runs a second time
+with tracemalloc to record the peak memory of every stage (tracing slows
+everything down, so it is not used for the timing). The results are
+written as JSON. With --thresholds every stage slower (or bigger) than
+its limit is reported and the exit code is 1.
+
+    python3 benchmarks/bench_sundial.py --steps 1 5 15 60 --thresholds benchmarks/thresholds.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import inkex
+from lxml import etree
+
+import sundial
+import sundial_core
+
+
+def write_csv(path, latitude, longitude, timezone, first_year, years, step):
+    """Write a synthetic sunearthtools "Annual sun path" CSV."""
+    with open(path, "w") as f:
+        for year in range(first_year, first_year + years):
+            dates, times, el, az = sundial_core.sun_path(latitude, longitude, timezone, year, step)
+            if year == first_year:
+                header = [f"coo: {latitude:.4f} {longitude:.4f}"]
+                for t in times:
+                    header += [f"A {t}", f"E {t}"]
+                f.write(";".join(header) + "\n")
+            for day, el_row, az_row in zip(dates, el.tolist(), az.tolist()):
+                row = [day.isoformat()]
+                for e, a in zip(el_row, az_row):
+                    if e != e:
+                        row += ["--", "--"]
+                    else:
+                        row += [f"{a:.2f}", f"{e:.2f}"]
+                f.write(";".join(row) + "\n")
+
+
+class Stages:
+    """Runs and measures one stage after the other."""
+    def __init__(self, trace):
+        self.trace = trace
+        self.results = {}
+
+    def run(self, name, func, *args):
+        if not self.trace:
+            start = time.perf_counter()
+            result = func(*args)
+            self.results[name] = {"seconds": round(time.perf_counter() - start, 4)}
+            return result
+
+        tracemalloc.start()
+        result = func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.results[name] = {"peak_mb": round(peak / 1e6, 2)}
+        return result
+
+
+def bench_csv(path, sundial_args, trace=False):
+    """Measure the stages of one effect run on the CSV at path."""
+    dial = sundial.Sundial()
+    dial.parse_arguments(sundial_args + [f"--csvfile={path}"])
+    dial.load_options()
+    stages = Stages(trace)
+
+    sidecar = path + sundial_core.SIDECAR_SUFFIX
+    if os.path.exists(sidecar):
+        os.remove(sidecar)
+    gps_coords, dates, times, el, az = stages.run("parse", sundial_core.read_csv, path)
+    stages.run("sidecar_write", sundial_core.load_csv, path)
+    gps_coords, dates, times, el, az = stages.run("sidecar_load", sundial_core.load_csv, path)
+    # the first year (or the average of all years), like collect_curves()
+    dates, el, az = next(dial.year_tables(dates, el, az))
+    # the projection (map_coords_batch, fold_box) is timed on its own
+    # within sun_grid() by the Stats of the dial
+    dial.stats = sundial_core.Stats(not trace)
+    grid = stages.run("grid", dial.sun_grid, dates, times, el, az)
+    if not trace:
+        stages.results["projection"] = {"seconds": round(dial.stats.stages["projection"], 4)}
+    curves = stages.run("bucket", dial.bucket_curves, gps_coords, grid)
+
+    group = etree.Element(inkex.addNS('g', 'svg'))
+    def emit():
+        dial.draw_template(group)
+        dial.draw_location(group, curves)
+        dial.draw_months(group, curves)
+        dial.draw_hours(group, curves)
+        if dial.css_classes:
+            dial.write_styles(group)
+    stages.run("emit", emit)
+    svg = stages.run("serialize", etree.tostring, group)
+
+    stages.results["counts"] = {"cells": int(np.count_nonzero(grid.valid)),
+                                "elements": sum(1 for _ in group.iter()) - 1,
+                                "bytes": len(svg),
+                                "csv_bytes": os.path.getsize(path)}
+    return stages.results
+
+
+def check(results, thresholds):
+    """List of messages for every value above its threshold.
+
+    thresholds maps "<case>.<stage>" (case "*" for all cases) to a dict
+    with "seconds" and/or "peak_mb".
+    """
+    failures = []
+    for case, stages in results.items():
+        for stage, values in stages.items():
+            if stage == "counts":
+                continue
+            for key in (f"{case}.{stage}", f"*.{stage}"):
+                if key not in thresholds:
+                    continue
+                for metric, limit in thresholds[key].items():
+                    if values.get(metric, 0) > limit:
+                        failures.append(f"{case}.{stage}: {metric} {values[metric]} > {limit}")
+                break
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, nargs="+", default=[1, 5, 15, 60],
+                        help="Minutes between the samples of the generated CSVs")
+    parser.add_argument("--years", type=int, default=1, help="Years per CSV")
+    parser.add_argument("--latitude", type=float, default=48.2082)
+    parser.add_argument("--longitude", type=float, default=16.3738)
+    parser.add_argument("--timezone", type=float, default=1.0)
+    parser.add_argument("--output", default="bench_output.json", help="JSON file for the results")
+    parser.add_argument("--thresholds", default=None, help="JSON file with the limits per stage")
+    parser.add_argument("--keep", default=None, help="Directory to keep the generated CSVs in")
+    parser.add_argument("sundial_args", nargs="*", default=["--box_mode=true"],
+                        help="Options for sundial.py, after --")
+    options = parser.parse_args(argv)
+
+    results = {}
+    workdir = options.keep or tempfile.mkdtemp(prefix="sundial-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    for step in options.steps:
+        case = f"{step}min_{options.years}y"
+        path = os.path.join(workdir, f"sun_{case}.csv")
+        if not os.path.exists(path):
+            write_csv(path, options.latitude, options.longitude, options.timezone,
+                      2021, options.years, step)
+        results[case] = bench_csv(path, options.sundial_args)
+        for stage, values in bench_csv(path, options.sundial_args, trace=True).items():
+            if stage != "counts":
+                results[case][stage].update(values)
+        print(case, json.dumps(results[case]))
+
+    report = {"python": platform.python_version(),
+              "numpy": np.__version__,
+              "machine": platform.machine(),
+              "sundial_args": options.sundial_args,
+              "results": results}
+    with open(options.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if not options.keep:
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+
+    if options.thresholds:
+        with open(options.thresholds) as f:
+            failures = check(results, json.load(f))
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        if failures:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Render many sundials without Inkscape.
+
+The manifest is a JSON list of objects or a CSV file with a header row.
+Every job uses the option names of sundial.py (csvfile, source,
+latitude, longitude, timezone, year, step, length, box_mode, day_start,
+day_end, sundial_type, solstice_summer, solstice_winter, offset_x,
+offset_y, bounding_box) and optionally "output" for the SVG to write.
+Options which are missing use the defaults of sundial.py.
+
+Without --template the SVG is written while it is drawn (see
+sundial_svg.write_svg), Inkscape's modules are only needed to draw into
+a template document.
+
+    python3 sundial_batch.py jobs.json --outdir dials -j 8
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import json
+import os
+import sys
+
+# job entries which are file names relative to the manifest
+PATH_KEYS = ("csvfile", "output")
+
+
+def read_manifest(path):
+    """List of job dicts from a JSON or CSV manifest."""
+    with open(path, newline='') as f:
+        if path.lower().endswith(".json"):
+            jobs = json.load(f)
+        else:
+            jobs = [row for row in csv.DictReader(f)]
+
+    base = os.path.dirname(os.path.abspath(path))
+    for job in jobs:
+        for key in PATH_KEYS:
+            if job.get(key):
+                job[key] = os.path.join(base, job[key])
+    return jobs
+
+
+def job_args(job):
+    """Command line of sundial.py for one job, without "output"."""
+    args = []
+    for key, value in job.items():
+        if key == "output" or value is None or value == "":
+            continue
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        args.append(f"--{key}={value}")
+    return args
+
+
+def data_key(job):
+    """Jobs with the same key share the parsed sun path data."""
+    if job.get("source") == "compute":
+        return ("compute",) + tuple(str(job.get(k, "")) for k in
+                                    ("latitude", "longitude", "timezone", "year", "step"))
+    return ("csv", job.get("csvfile") or "")
+
+
+def render(tasks, template):
+    """Render a list of (job, output) in this process.
+
+    Returns a list of (output, error message or None).
+    """
+    # imported here, the parent process does not need them
+    if template is None:
+        from sundial_svg import write_svg, parse_params
+    else:
+        from sundial import Sundial
+
+    results = []
+    for job, output in tasks:
+        try:
+            if template is None:
+                params = parse_params({k: v for k, v in job.items() if k != "output"})
+                # a failed job must not leave a truncated SVG behind
+                partial = output + ".tmp"
+                try:
+                    with open(partial, "w") as f:
+                        write_svg(f, **params)
+                    os.replace(partial, output)
+                finally:
+                    if os.path.exists(partial):
+                        os.remove(partial)
+            else:
+                Sundial().run(job_args(job) + [f"--output={output}", template])
+            results.append((output, None))
+        except (Exception, SystemExit) as err:
+            results.append((output, f"{type(err).__name__}: {err}"))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("manifest", help="JSON or CSV file with one job per entry")
+    parser.add_argument("-o", "--outdir", default=".",
+                        help="Directory for jobs without an output file")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="Number of worker processes")
+    parser.add_argument("--chunk", type=int, default=4,
+                        help="Jobs of the same location handed to a worker at once")
+    parser.add_argument("--template", default=None,
+                        help="SVG document to draw into with Inkscape's modules, a blank A3 page by default")
+    options = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.makedirs(options.outdir, exist_ok=True)
+
+    jobs = read_manifest(options.manifest)
+    groups = {}
+    for i, job in enumerate(jobs):
+        output = job.get("output") or os.path.join(options.outdir, f"sundial_{i:04d}.svg")
+        groups.setdefault(data_key(job), []).append((job, output))
+
+    # jobs of one location stay together so a worker parses it only once
+    tasks = [group[i:i + options.chunk]
+             for group in groups.values()
+             for i in range(0, len(group), options.chunk)]
+
+    failed = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=options.jobs) as pool:
+        for results in pool.map(render, tasks, [options.template] * len(tasks)):
+            for output, error in results:
+                if error:
+                    failed += 1
+                    print(f"{output}: {error}", file=sys.stderr)
+                else:
+                    print(output)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1620 @@
+"""Sun path data, projection and curve bucketing of the sundial.
+
+Nothing in here needs Inkscape: sundial.py is the extension drawing the
+result, this module can be used on its own, e.g.
+
+    core = SundialCore(source="compute", latitude=48.2, longitude=16.37)
+    curves = core.collect_curves()
+"""
+
+import re
+import math
+import csv
+import os
+import json
+import hashlib
+import time
+import contextlib
+import datetime
+import calendar
+import tempfile
+import zipfile
+import numpy as np
+
+
+# faces a projected point can land on, see SundialCore.map_coords_batch
+FACE_FLAT = 0
+FACE_TOP = 1
+FACE_LEFT = 2
+FACE_BOTTOM = 3
+
+# bump this if sun_path() changes its results, old cache files are ignored then
+SUN_PATH_VERSION = 1
+# name of the cache files of cached_sun_path()
+SUN_PATH_PREFIX = "sunpath-"
+
+# binary sidecar written next to a parsed CSV, see load_csv()
+SIDECAR_SUFFIX = ".sundial"
+SIDECAR_MAGIC = b"SUNDIAL2"
+SIDECAR_TABLE_OFFSET = 16
+
+# upper limit for the cache files in one directory before the least
+# recently used ones are removed
+CACHE_MAX_BYTES = int(os.environ.get("SUNDIAL_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+
+class DialError(ValueError):
+    """The dial cannot be drawn with these parameters and data, e.g. no latitude."""
+
+
+class SunCurves:
+    """Projected sun positions sorted into the lines of the dial."""
+    def __init__(self):
+        self.gps_coords = ""
+        self.year = None
+        self.summer_date = None
+        self.winter_date = None
+        self.months = {} #full day of each 1st in a month
+        self.month_dots = {} #full day of each 1st in a month only full hours
+
+        #time from 1st of Jan to summer solstice
+        self.hours_summer1 = {} # one hour over the whole year
+
+        #time from winter solstice to 31st of December
+        self.hours_summer2 = {} # one hour over the whole year
+        self.hours_winter = {} # one hour over the whole year
+
+        # SunCurves of further years drawn on top, see multi_year
+        self.overlays = []
+        # see SundialCore.label_positions
+        self.labels = None
+
+
+class SunPathGrid:
+    """Projected sun positions of one year as day x time slot arrays.
+
+    x, y and face are shaped (days, slots), valid marks the cells with
+    the sun above the horizon, within the day and within the bounding
+    box. Row i is dates[i], column j the time slots[j] ("HH:MM").
+    In box mode gx, gy are the ground coordinates and box the parameters
+    of clip_to_box(), the lines get a vertex on every fold then.
+    """
+    def __init__(self, dates, slots, full_hour, x, y, face, valid, gx=None, gy=None, box=None):
+        self.dates = dates
+        self.slots = slots
+        self.full_hour = full_hour
+        self.x = x
+        self.y = y
+        self.face = face
+        self.valid = valid
+        self.gx = gx
+        self.gy = gy
+        self.box = box
+        self.ordinals = np.array([d.toordinal() for d in dates], dtype=np.int64)
+
+    def day_index(self, date):
+        """Row of the first day after date, len(dates) if there is none."""
+        return int(np.searchsorted(self.ordinals, date.toordinal(), side='right'))
+
+    def points(self, rows, cols):
+        if self.box is None:
+            return list(zip(self.x[rows, cols].tolist(), self.y[rows, cols].tolist(),
+                            self.face[rows, cols].tolist()))
+        return clip_to_box(self.x[rows, cols], self.y[rows, cols], self.face[rows, cols],
+                           self.gx[rows, cols], self.gy[rows, cols], self.box)
+
+    def hour_line(self, slot, start=0, stop=None):
+        """(x, y, face) of the time slot index from row start to stop."""
+        rows = np.flatnonzero(self.valid[start:stop, slot]) + start
+        return self.points(rows, slot)
+
+    def hour_lines(self, start=0, stop=None):
+        """{"HH:MM": hour_line()} of all slots with points from row start to stop.
+
+        The slots are ordered by the day they first appear.
+        """
+        valid = self.valid[start:stop]
+        cols = np.flatnonzero(valid.any(axis=0))
+        if not valid.shape[0] or not cols.size:
+            # e.g. no days after a solstice on Dec 31
+            return {}
+        first = valid.argmax(axis=0)[cols]
+        return {self.slots[j]: self.hour_line(j, start, stop)
+                for j in cols[np.lexsort((cols, first))].tolist()}
+
+    def day_slots(self, day, face=None):
+        """Indexes of the valid time slots of the row, optionally only on one face."""
+        valid = self.valid[day]
+        if face is not None:
+            valid = valid & (self.face[day] == face)
+        return np.flatnonzero(valid)
+
+    def day_curve(self, date, face=None):
+        """(x, y, face) of the date over the day, [] if the grid does not have it."""
+        day = self.day_index(date) - 1
+        if day < 0 or self.ordinals[day] != date.toordinal():
+            return []
+        return self.points(day, self.day_slots(day, face))
+
+
+class Stats:
+    """Wall time per stage and counters of one run, see Sundial.report_stats()."""
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}
+        self.counters = {}
+        self.curves = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def curve(self, name, points):
+        """Remember the number of points of a drawn line."""
+        if self.enabled:
+            self.curves.setdefault(name, []).append(points)
+
+    def report(self):
+        points = [n for counts in self.curves.values() for n in counts]
+        return {"stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+                "counters": self.counters,
+                "curve_points": {"curves": len(points),
+                                 "total": sum(points),
+                                 "min": min(points, default=0),
+                                 "max": max(points, default=0)},
+                "curves": self.curves}
+
+
+def cache_dir():
+    """Directory for cached sun path data, created on demand."""
+    path = os.environ.get("SUNDIAL_CACHE")
+    if not path:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        path = os.path.join(base, "sundial")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def evict_cache(directory, suffix, max_bytes=None, magic=None, prefix=""):
+    """Remove the least recently used prefix*suffix files until below max_bytes.
+
+    With magic only the files starting with it are counted and removed,
+    files of the same name written by someone else stay.
+    """
+    if max_bytes is None:
+        max_bytes = CACHE_MAX_BYTES
+    entries = []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.startswith(prefix) and entry.name.endswith(suffix) and entry.is_file():
+                    if magic is not None and not starts_with(entry.path, magic):
+                        continue
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+    except OSError:
+        return
+    total = sum(e[1] for e in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def starts_with(path, magic):
+    """True if the file at path starts with the bytes magic."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(magic)) == magic
+    except OSError:
+        return False
+
+
+def touch(path):
+    """Mark a cache file as recently used for evict_cache()."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def sun_position(latitude, longitude, timezone, days, minutes):
+    """Sun elevation and azimuth in degrees (NOAA solar calculator).
+
+    days are proleptic Gregorian ordinals (datetime.date.toordinal()),
+    minutes the local standard time of the day, both are broadcast
+    against each other. The azimuth is counted clockwise from north and
+    the elevation includes the atmospheric refraction.
+    """
+    days = np.asarray(days, dtype=float)
+    minutes = np.asarray(minutes, dtype=float)
+    # 1721424.5 is the julian day of ordinal 1 at midnight
+    jd = days + 1721424.5 + (minutes / 60.0 - timezone) / 24.0
+    jc = (jd - 2451545.0) / 36525.0
+
+    mean_long = np.mod(280.46646 + jc * (36000.76983 + jc * 0.0003032), 360.0)
+    mean_anom = 357.52911 + jc * (35999.05029 - 0.0001537 * jc)
+    eccent = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+    mean_anom_rad = np.radians(mean_anom)
+    eq_ctr = np.sin(mean_anom_rad) * (1.914602 - jc * (0.004817 + 0.000014 * jc)) + \
+             np.sin(2 * mean_anom_rad) * (0.019993 - 0.000101 * jc) + \
+             np.sin(3 * mean_anom_rad) * 0.000289
+    omega = np.radians(125.04 - 1934.136 * jc)
+    app_long = mean_long + eq_ctr - 0.00569 - 0.00478 * np.sin(omega)
+    mean_obliq = 23 + (26 + ((21.448 - jc * (46.815 + jc * (0.00059 - jc * 0.001813)))) / 60) / 60
+    obliq_rad = np.radians(mean_obliq + 0.00256 * np.cos(omega))
+    decl_rad = np.arcsin(np.sin(obliq_rad) * np.sin(np.radians(app_long)))
+
+    var_y = np.tan(obliq_rad / 2) ** 2
+    mean_long_rad = np.radians(mean_long)
+    eq_time = 4 * np.degrees(var_y * np.sin(2 * mean_long_rad)
+                             - 2 * eccent * np.sin(mean_anom_rad)
+                             + 4 * eccent * var_y * np.sin(mean_anom_rad) * np.cos(2 * mean_long_rad)
+                             - 0.5 * var_y ** 2 * np.sin(4 * mean_long_rad)
+                             - 1.25 * eccent ** 2 * np.sin(2 * mean_anom_rad))
+
+    true_solar_time = np.mod(minutes + eq_time + 4 * longitude - 60 * timezone, 1440.0)
+    hour_angle = true_solar_time / 4.0 - 180.0
+    lat_rad = math.radians(latitude)
+    cos_zenith = math.sin(lat_rad) * np.sin(decl_rad) + \
+                 math.cos(lat_rad) * np.cos(decl_rad) * np.cos(np.radians(hour_angle))
+    zenith_rad = np.arccos(np.clip(cos_zenith, -1.0, 1.0))
+    elevation = 90.0 - np.degrees(zenith_rad)
+
+    # atmospheric refraction, approximation used by NOAA
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tan_el = np.tan(np.radians(elevation))
+        refraction = np.select(
+            [elevation > 85, elevation > 5, elevation > -0.575],
+            [0.0,
+             58.1 / tan_el - 0.07 / tan_el ** 3 + 0.000086 / tan_el ** 5,
+             1735 + elevation * (-518.2 + elevation * (103.4 + elevation * (-12.79 + elevation * 0.711)))],
+            -20.772 / tan_el) / 3600.0
+        elevation = elevation + refraction
+
+        cos_az = (math.sin(lat_rad) * np.cos(zenith_rad) - np.sin(decl_rad)) / \
+                 (math.cos(lat_rad) * np.sin(zenith_rad))
+    az = np.degrees(np.arccos(np.clip(cos_az, -1.0, 1.0)))
+    azimuth = np.where(hour_angle > 0, np.mod(az + 180, 360.0), np.mod(540 - az, 360.0))
+    return (elevation, azimuth)
+
+
+def sun_path(latitude, longitude, timezone, year, step):
+    """Annual sun path like the sunearthtools CSV, computed in process.
+
+    Returns (dates, times, elevation, azimuth): the datetime.date of each
+    day of the year, "HH:MM:SS" for each slot of step minutes and two
+    arrays shaped (days, slots). Slots with the sun below the horizon
+    are NaN.
+    """
+    first = datetime.date(year, 1, 1).toordinal()
+    last = datetime.date(year, 12, 31).toordinal()
+    days = np.arange(first, last + 1)
+    minutes = np.arange(0, 24 * 60, step)
+    el, az = sun_position(latitude, longitude, timezone, days[:, np.newaxis], minutes[np.newaxis, :])
+    below = el <= 0
+    el[below] = np.nan
+    az[below] = np.nan
+
+    dates = [datetime.date.fromordinal(int(o)) for o in days]
+    times = [f"{m // 60:02d}:{m % 60:02d}:00" for m in minutes.tolist()]
+    return (dates, times, el, az)
+
+
+def cached_sun_path(latitude, longitude, timezone, year, step):
+    """sun_path() with the result stored in cache_dir()."""
+    key = f"{SUN_PATH_VERSION}|{latitude!r}|{longitude!r}|{timezone!r}|{year}|{step}"
+    name = SUN_PATH_PREFIX + hashlib.sha1(key.encode()).hexdigest()[:16] + ".npz"
+    try:
+        path = os.path.join(cache_dir(), name)
+    except OSError:
+        # without a cache directory the sun path is computed every time
+        return sun_path(latitude, longitude, timezone, year, step)
+    try:
+        with np.load(path) as data:
+            dates = [datetime.date.fromordinal(int(o)) for o in data["days"]]
+            times = [f"{m // 60:02d}:{m % 60:02d}:00" for m in data["minutes"].tolist()]
+            el, az = data["elevation"], data["azimuth"]
+        touch(path)
+        return (dates, times, el, az)
+    except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+        # missing or broken, it is computed and written again
+        pass
+
+    dates, times, el, az = sun_path(latitude, longitude, timezone, year, step)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            np.savez(f,
+                     days=np.array([d.toordinal() for d in dates]),
+                     minutes=np.arange(0, 24 * 60, step),
+                     elevation=el, azimuth=az)
+        os.replace(tmp, path)
+        evict_cache(os.path.dirname(path), ".npz", prefix=SUN_PATH_PREFIX)
+    except OSError:
+        # a read-only cache only costs speed
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return (dates, times, el, az)
+
+
+# sun path tables already loaded by this process, see loaded_table()
+LOADED_TABLES_MAX = 8
+_loaded_tables = {}
+
+
+def loaded_table(key, load, *args):
+    """Call load(*args) once per key and process, e.g. for batch workers."""
+    if key not in _loaded_tables:
+        if len(_loaded_tables) >= LOADED_TABLES_MAX:
+            del _loaded_tables[next(iter(_loaded_tables))]
+        _loaded_tables[key] = load(*args)
+    return _loaded_tables[key]
+
+
+# projection kernels by name, see projection()
+# kernel(dial, length, el, az, latitude) projects arrays of elevation and
+# azimuth (degrees) onto the plate of a SundialCore and returns the x and
+# y arrays on the paper, NaN where the plate does not get the sun
+PROJECTIONS = {}
+
+
+def projection(name):
+    """Decorator to register a projection kernel, see PROJECTIONS."""
+    def register(kernel):
+        PROJECTIONS[name] = kernel
+        return kernel
+    return register
+
+
+# projections which depend on the latitude of the sun path data
+LATITUDE_PROJECTIONS = ("polar", "equatorial")
+
+
+def coords_latitude(gps_coords):
+    """Latitude of the "lat,lon" or "lat lon" gps_coords of a table, None if there is none."""
+    try:
+        latitude = float(re.split(r"[,;\s]+", gps_coords.strip())[0])
+    except (ValueError, IndexError):
+        return None
+    return latitude if -90 <= latitude <= 90 else None
+
+
+def sun_vectors(el, az):
+    """East, north and up components of the direction to the sun."""
+    el = np.radians(el)
+    az = np.radians(az)
+    return (np.cos(el) * np.sin(az), np.cos(el) * np.cos(az), np.sin(el))
+
+
+def polar_axes(latitude, north, up):
+    """Components along the earth's axis and along the normal of the equator
+    plane pointing up (towards the sky of the equator side)."""
+    lat = math.radians(latitude)
+    return (north * math.cos(lat) + up * math.sin(lat),
+            up * math.cos(lat) - north * math.sin(lat))
+
+
+@projection("horizontal")
+def project_horizontal(dial, length, el, az, latitude):
+    """Flat plate with a vertical stick, north is to the left."""
+    tan_el = np.tan(np.radians(el))
+    d = length / tan_el
+    az_rad = np.radians(az)
+    return (np.cos(az_rad) * d + dial.offset_x,
+            np.sin(az_rad) * d + dial.offset_y)
+
+
+@projection("vertical")
+def project_vertical(dial, length, el, az, latitude):
+    """Wall facing wall_azimuth (180 = south) with the stick at a right angle.
+
+    Seen from the front of the wall, the stick is at the offsets.
+    """
+    east, north, up = sun_vectors(el, az)
+    wall = math.radians(dial.wall_azimuth)
+    front = east * math.sin(wall) + north * math.cos(wall)
+    right = north * math.sin(wall) - east * math.cos(wall)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(front > 0, length / front, np.nan)
+    return (dial.offset_x - t * right, dial.offset_y + t * up)
+
+
+@projection("polar")
+def project_polar(dial, length, el, az, latitude):
+    """Plate parallel to the earth's axis facing the equator, the stick at a
+    right angle. North is up, the noon line is vertical."""
+    east, north, up = sun_vectors(el, az)
+    axis, normal = polar_axes(latitude, north, up)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(normal > 0, length / normal, np.nan)
+    return (dial.offset_x - t * east, dial.offset_y + t * axis)
+
+
+@projection("equatorial")
+def project_equatorial(dial, length, el, az, latitude):
+    """Inner side of a ring of radius length around the earth's axis, unrolled.
+
+    The shadow of a bead in the center moves along the ring by the hour
+    angle (noon at offset_x) and across it by the declination of the sun.
+    """
+    east, north, up = sun_vectors(el, az)
+    axis, normal = polar_axes(latitude, north, up)
+    hour_angle = np.arctan2(-east, normal)
+    declination = np.arcsin(np.clip(axis, -1.0, 1.0))
+    return (dial.offset_x + length * hour_angle,
+            dial.offset_y + length * np.tan(declination))
+
+
+def box_crossings(g0, g1, face, box):
+    """Vertices where the segment g0 -> g1 crosses a fold or cut of the box.
+
+    g0 and g1 are ground coordinates (the shadow on an endless flat
+    surface), face is the FACE_* of g0 and box is (offset_x, offset_y,
+    flat size, length). A fold gives one vertex on the paper, shared by
+    both faces. The edge between two sides of the box is cut on the
+    paper, it gives one vertex on each side.
+    Returns a list of (x, y, face) in the order of the segment.
+    """
+    ox, oy, flat_size, length = box
+    left = ox - flat_size
+    top = oy - flat_size
+    bottom = oy + flat_size
+    (x0, y0), (x1, y1) = g0, g1
+    dx = x1 - x0
+    dy = y1 - y0
+
+    # (t along the segment, the two faces of the edge)
+    hits = []
+    if dy:
+        for fold_y, side in ((top, FACE_TOP), (bottom, FACE_BOTTOM)):
+            t = (fold_y - y0) / dy
+            if 0 < t < 1 and x0 + t * dx >= left:
+                hits.append((t, FACE_FLAT, side))
+    if dx:
+        t = (left - x0) / dx
+        if 0 < t < 1 and top <= y0 + t * dy <= bottom:
+            hits.append((t, FACE_FLAT, FACE_LEFT))
+    # the corners of the box are on the diagonals through the foot of the stick
+    for sign, side in ((1, FACE_TOP), (-1, FACE_BOTTOM)):
+        den = dx - sign * dy
+        if den:
+            t = (sign * (y0 - oy) - (x0 - ox)) / den
+            if 0 < t < 1 and x0 + t * dx < left:
+                hits.append((t, side, FACE_LEFT))
+    hits.sort()
+
+    vertices = []
+    for t, face_a, face_b in hits:
+        if face == face_a:
+            new_face = face_b
+        elif face == face_b:
+            new_face = face_a
+        else:
+            # rounding, the segment is not on this edge
+            continue
+        cx = x0 + t * dx
+        cy = y0 + t * dy
+        if face_a == FACE_FLAT:
+            if face_b == FACE_LEFT:
+                vertices.append((left, cy, new_face))
+            else:
+                vertices.append((cx, top if face_b == FACE_TOP else bottom, new_face))
+        else:
+            # height of the shadow on the corner, unfolded onto both sides
+            h = length * (1 - flat_size * math.sqrt(2) / math.hypot(cx - ox, cy - oy))
+            fold_y = top if face_a == FACE_TOP else bottom
+            on_side = (left, fold_y - h if face_a == FACE_TOP else fold_y + h, face_a)
+            on_left = (left - h, fold_y, FACE_LEFT)
+            vertices += [on_side, on_left] if face == face_a else [on_left, on_side]
+        face = new_face
+    return vertices
+
+
+def clip_to_box(x, y, face, gx, gy, box):
+    """(x, y, face) of a line on the box with the vertices of box_crossings().
+
+    x, y, face are the arrays of the points on the paper, gx, gy their
+    ground coordinates. Only the segments changing the face are looked
+    at.
+    """
+    points = list(zip(x.tolist(), y.tolist(), face.tolist()))
+    changes = np.flatnonzero(face[1:] != face[:-1]).tolist()
+    if not changes:
+        return points
+    gx = gx.tolist()
+    gy = gy.tolist()
+    clipped = []
+    start = 0
+    for i in changes:
+        clipped += points[start:i + 1]
+        clipped += box_crossings((gx[i], gy[i]), (gx[i + 1], gy[i + 1]), points[i][2], box)
+        start = i + 1
+    clipped += points[start:]
+    return clipped
+
+
+def is_cut(a, b):
+    """True if the paper is cut between the points, they are on two sides of the box."""
+    return len(a) > 2 and a[2] != b[2] and a[2] != FACE_FLAT and b[2] != FACE_FLAT
+
+
+def split_at_cuts(path):
+    """The parts of a line between the cuts of the box, see is_cut()."""
+    parts = [[path[0]]]
+    for a, b in zip(path, path[1:]):
+        if is_cut(a, b):
+            parts.append([])
+        parts[-1].append(b)
+    return parts
+
+
+def simplify_polyline(points, tolerance, keep=()):
+    """Ramer-Douglas-Peucker simplification of a list of (x, y, ...) points.
+
+    Points are dropped as long as the line stays within tolerance. The
+    first, the last and the points with an index in keep are never
+    dropped, the line is simplified between them independently.
+    """
+    n = len(points)
+    if n < 3 or tolerance <= 0:
+        return list(points)
+    xy = np.array([(p[0], p[1]) for p in points], dtype=float)
+    mask = np.zeros(n, dtype=bool)
+    mask[0] = mask[-1] = True
+    mask[list(keep)] = True
+
+    anchors = np.flatnonzero(mask).tolist()
+    stack = list(zip(anchors[:-1], anchors[1:]))
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        seg_x, seg_y = xy[b] - xy[a]
+        pts = xy[a + 1:b] - xy[a]
+        seg_len = math.hypot(seg_x, seg_y)
+        if seg_len == 0:
+            dist = np.hypot(pts[:, 0], pts[:, 1])
+        else:
+            dist = np.abs(seg_x * pts[:, 1] - seg_y * pts[:, 0]) / seg_len
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            mid = a + 1 + i
+            mask[mid] = True
+            stack.append((a, mid))
+            stack.append((mid, b))
+    return [points[i] for i in np.flatnonzero(mask).tolist()]
+
+
+def _bernstein(u):
+    """Cubic Bernstein basis at the parameters u, shaped (len(u), 4)."""
+    v = 1 - u
+    return np.stack((v**3, 3 * v**2 * u, 3 * v * u**2, u**3), axis=1)
+
+
+def _fit_one_bezier(pts, basis, t_left, t_right):
+    """Least squares cubic through pts with the given end tangents."""
+    first, last = pts[0], pts[-1]
+    b1, b2 = basis[:, 1], basis[:, 2]
+    rest = pts - np.outer(basis[:, 0] + b1, first) - np.outer(b2 + basis[:, 3], last)
+    # the tangents are unit vectors
+    c00 = b1 @ b1
+    c01 = (t_left @ t_right) * (b1 @ b2)
+    c11 = b2 @ b2
+    x0 = t_left @ (b1 @ rest)
+    x1 = t_right @ (b2 @ rest)
+    det = c00 * c11 - c01 * c01
+    seg_len = math.hypot(*(last - first))
+    alpha_l = alpha_r = 0.0
+    if abs(det) > 1e-12:
+        alpha_l = (x0 * c11 - x1 * c01) / det
+        alpha_r = (c00 * x1 - c01 * x0) / det
+    if alpha_l < 1e-6 * seg_len or alpha_r < 1e-6 * seg_len:
+        # fall back to a heuristic if the fit is degenerate
+        alpha_l = alpha_r = seg_len / 3
+    return np.array([first, first + t_left * alpha_l, last + t_right * alpha_r, last])
+
+
+def _unit(v):
+    n = math.hypot(*v)
+    return v / n if n else v
+
+
+def fit_cubic_beziers(points, tolerance):
+    """Fit piecewise cubic Beziers through a list of (x, y, ...) points.
+
+    Schneider's algorithm ("An Algorithm for Automatically Fitting
+    Digitized Curves", Graphics Gems): chord length parameters refined by
+    Newton-Raphson, split at the worst point until every point is within
+    tolerance. Returns a list of 4 x 2 control point arrays.
+    """
+    pts = np.array([(p[0], p[1]) for p in points], dtype=float)
+    if len(pts) > 1:
+        pts = pts[np.concatenate(([True], np.any(np.diff(pts, axis=0) != 0, axis=1)))]
+    if len(pts) < 2:
+        return []
+
+    result = []
+    stack = [(pts, _unit(pts[1] - pts[0]), _unit(pts[-2] - pts[-1]))]
+    while stack:
+        pts, t_left, t_right = stack.pop()
+        if len(pts) == 2:
+            dist = math.hypot(*(pts[1] - pts[0])) / 3
+            result.append(np.array([pts[0], pts[0] + t_left * dist, pts[1] + t_right * dist, pts[1]]))
+            continue
+
+        chords = np.concatenate(([0], np.cumsum(np.hypot(*np.diff(pts, axis=0).T))))
+        u = chords / chords[-1]
+        for _ in range(4):
+            basis = _bernstein(u)
+            ctrl = _fit_one_bezier(pts, basis, t_left, t_right)
+            diff = basis @ ctrl - pts
+            dist = np.hypot(diff[:, 0], diff[:, 1])
+            # only refine fits which are close already, split the others
+            if dist.max() <= tolerance or dist.max() > 4 * tolerance:
+                break
+            # Newton-Raphson step towards the closest point on the curve
+            d1 = 3 * np.diff(ctrl, axis=0)
+            d2 = 2 * np.diff(d1, axis=0)
+            u_ = u[:, np.newaxis]
+            q1 = (1 - u_)**2 * d1[0] + 2 * (1 - u_) * u_ * d1[1] + u_**2 * d1[2]
+            q2 = (1 - u_) * d2[0] + u_ * d2[1]
+            num = np.sum(diff * q1, axis=1)
+            den = np.sum(q1 * q1, axis=1) + np.sum(diff * q2, axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                step = np.where(den != 0, num / den, 0.0)
+            u = np.clip(u - step, 0.0, 1.0)
+        else:
+            basis = _bernstein(u)
+            ctrl = _fit_one_bezier(pts, basis, t_left, t_right)
+            diff = basis @ ctrl - pts
+            dist = np.hypot(diff[:, 0], diff[:, 1])
+
+        if dist.max() <= tolerance:
+            result.append(ctrl)
+            continue
+        split = int(np.clip(np.argmax(dist), 1, len(pts) - 2))
+        center = _unit(pts[split - 1] - pts[split + 1])
+        # the stack is LIFO, push the second half first
+        stack.append((pts[split:], -center, t_right))
+        stack.append((pts[:split + 1], t_left, center))
+    return result
+
+
+def text_box(x, y, text, anchor, fontsize):
+    """Rough (x0, y0, x1, y1) of a sans-serif text at the baseline point x, y."""
+    width = len(text) * fontsize * 0.6
+    if anchor == 'end':
+        x -= width
+    elif anchor == 'middle':
+        x -= width / 2
+    return (x, y - fontsize * 0.75, x + width, y + fontsize * 0.25)
+
+
+def label_candidates(x, y, gap, fontsize):
+    """Positions (x, y, anchor) for a label of the point x, y.
+
+    Right and left of the point at a few heights, then above and below.
+    """
+    candidates = []
+    for dy in (0.0, -0.5, 0.5, -1.0, 1.0, -1.5, 1.5):
+        baseline = y + fontsize * (0.25 + dy)
+        candidates.append((x + gap, baseline, 'start'))
+        candidates.append((x - gap, baseline, 'end'))
+    candidates.append((x, y - gap, 'middle'))
+    candidates.append((x, y + gap + fontsize * 0.75, 'middle'))
+    return candidates
+
+
+class LabelIndex:
+    """Uniform grid of the drawn lines and labels to place labels around.
+
+    Lines are cut into segments at most half a cell long, every segment
+    is stored in the cell of its lower left end, so a label box only has
+    to test the segments of the cells it covers (and the ones left of
+    and above them). Boxes (labels, dots) are stored in every cell they
+    touch.
+    """
+    def __init__(self, cell):
+        self.cell = cell
+        self.segments = {}
+        self.boxes = {}
+        self._pending = []
+
+    def add_line(self, path):
+        pts = np.array([(p[0], p[1]) for p in path], dtype=float).reshape(-1, 2)
+        if len(pts) < 2:
+            return
+        seg = np.diff(pts, axis=0)
+        n = np.maximum(np.ceil(np.hypot(seg[:, 0], seg[:, 1]) / (self.cell / 2)), 1).astype(np.intp)
+        idx = np.repeat(np.arange(len(seg)), n)
+        k = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        steps = np.repeat(n, n)[:, np.newaxis]
+        start = pts[idx] + seg[idx] * (k[:, np.newaxis] / steps)
+        stop = pts[idx] + seg[idx] * ((k[:, np.newaxis] + 1) / steps)
+        self._pending.append(np.hstack((start, stop)))
+
+    def add_box(self, box, weight):
+        for key in self._cells(box):
+            self.boxes.setdefault(key, []).append((box, weight))
+
+    def _cells(self, box, before=0):
+        x0, y0, x1, y1 = box
+        c = self.cell
+        return [(i, j)
+                for i in range(math.floor(x0 / c) - before, math.floor(x1 / c) + 1)
+                for j in range(math.floor(y0 / c) - before, math.floor(y1 / c) + 1)]
+
+    def _build(self):
+        segs = np.vstack(self._pending)
+        self._pending = []
+        keys = np.floor(np.minimum(segs[:, :2], segs[:, 2:]) / self.cell).astype(np.int64)
+        order = np.lexsort((keys[:, 1], keys[:, 0]))
+        segs, keys = segs[order], keys[order]
+        starts = np.concatenate(([0], np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1))
+        stops = np.append(starts[1:], len(segs))
+        for start, stop, key in zip(starts.tolist(), stops.tolist(), map(tuple, keys[starts].tolist())):
+            old = self.segments.get(key)
+            self.segments[key] = segs[start:stop] if old is None else np.vstack((old, segs[start:stop]))
+
+    def cost(self, box):
+        """Line segments crossing the box plus the weights of the boxes it overlaps."""
+        if self._pending:
+            self._build()
+        cost = 0
+        # a segment is shorter than a cell, it reaches at most one cell
+        # beyond the cell it is stored in
+        found = [self.segments[key] for key in self._cells(box, before=1) if key in self.segments]
+        if found:
+            cost += np.count_nonzero(segments_in_box(np.vstack(found), box))
+        seen = set()
+        x0, y0, x1, y1 = box
+        for key in self._cells(box):
+            for other, weight in self.boxes.get(key, ()):
+                if id(other) in seen:
+                    continue
+                seen.add(id(other))
+                if other[0] < x1 and other[2] > x0 and other[1] < y1 and other[3] > y0:
+                    cost += weight
+        return cost
+
+
+def segments_in_box(segs, box):
+    """Mask of the segments (rows of x0, y0, x1, y1) touching the box (Liang-Barsky)."""
+    x0, y0, x1, y1 = box
+    low = np.zeros(len(segs))
+    high = np.ones(len(segs))
+    for start, delta, lo, hi in ((segs[:, 0], segs[:, 2] - segs[:, 0], x0, x1),
+                                 (segs[:, 1], segs[:, 3] - segs[:, 1], y0, y1)):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_lo = (lo - start) / delta
+            t_hi = (hi - start) / delta
+        enter = np.minimum(t_lo, t_hi)
+        leave = np.maximum(t_lo, t_hi)
+        # parallel to this axis: within the slab all along or never
+        parallel = delta == 0
+        within = (start >= lo) & (start <= hi)
+        enter = np.where(parallel, np.where(within, -np.inf, np.inf), enter)
+        leave = np.where(parallel, np.where(within, np.inf, -np.inf), leave)
+        low = np.maximum(low, enter)
+        high = np.minimum(high, leave)
+    return low <= high
+
+
+def compile_header(fieldnames):
+    """Turn the CSV header into a plan of the columns to read.
+
+    Returns a list of (azimuth index, elevation index, "HH:MM:SS") for
+    every time slot that has both columns, in the order of the azimuth
+    columns.
+    """
+    date_re = re.compile(r"(?P<angle>[AE]) (?P<timestamp>\d{2}:\d{2}:\d{2})")
+
+    azimuth = []
+    elevation = {}
+    for i, col in enumerate(fieldnames):
+        time_col = date_re.match(col)
+        if not time_col:
+            continue
+        if time_col.group("angle") == "E":
+            elevation[time_col.group("timestamp")] = i
+        else:
+            azimuth.append((i, time_col.group("timestamp")))
+
+    return [(i, elevation[timestamp], timestamp)
+            for i, timestamp in azimuth if timestamp in elevation]
+
+
+def stream_csv(path, out):
+    """Parse a sunearthtools "Annual sun path" CSV into the binary file out.
+
+    Every day is written as it is read, a row of float32 elevations of
+    all time slots followed by their azimuths (NaN for empty cells), so
+    only the dates are kept in memory. Returns (gps_coords, dates, times).
+    """
+    with open(path, newline='') as csvfile:
+        dialect = csv.Sniffer().sniff(csvfile.readline())
+        csvfile.seek(0)
+
+        reader = csv.reader(csvfile, dialect=dialect)
+        fieldnames = next(reader)
+        gps_coords = fieldnames[0].replace("coo: ","")
+        plan = compile_header(fieldnames)
+
+        dates = []
+        for row in reader:
+            if not row:
+                continue
+            dates.append(datetime.datetime.strptime(row[0], '%Y-%m-%d').date())
+            elevation = []
+            azimuth = []
+            for az_i, el_i, _ in plan:
+                try:
+                    elevation.append(float(row[el_i]))
+                except (ValueError, IndexError):
+                    elevation.append(math.nan)
+                try:
+                    azimuth.append(float(row[az_i]))
+                except (ValueError, IndexError):
+                    azimuth.append(math.nan)
+            out.write(np.array(elevation + azimuth, dtype="<f4").tobytes())
+
+    times = [timestamp for _, _, timestamp in plan]
+    return (gps_coords, dates, times)
+
+
+def map_table(file, offset, n_days, n_slots):
+    """Memory map the (days, 2, slots) table stream_csv() wrote at offset of file."""
+    if not n_days or not n_slots:
+        # nothing to map
+        return np.zeros((n_days, 2, n_slots), dtype="<f4")
+    return np.memmap(file, dtype="<f4", mode="r", offset=offset, shape=(n_days, 2, n_slots))
+
+
+def read_csv(path):
+    """Read a sunearthtools "Annual sun path" CSV.
+
+    Returns (gps_coords, dates, times, elevation, azimuth) like
+    sun_path(), the arrays are float32 with NaN for empty cells. They
+    are mapped from an anonymous temporary file, see stream_csv().
+    """
+    with tempfile.TemporaryFile() as f:
+        gps_coords, dates, times = stream_csv(path, f)
+        f.flush()
+        table = map_table(f, 0, len(dates), len(times))
+    return (gps_coords, dates, times, table[:, 0], table[:, 1])
+
+
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def read_sidecar_header(sidecar):
+    """(header, header_offset) of a sidecar written by load_csv().
+
+    Raises OSError or ValueError if it is not one.
+    """
+    with open(sidecar, "rb") as f:
+        if f.read(len(SIDECAR_MAGIC)) != SIDECAR_MAGIC:
+            raise ValueError("not a sidecar")
+        header_offset = int.from_bytes(f.read(8), "little")
+        f.seek(header_offset)
+        return (json.loads(f.read()), header_offset)
+
+
+def csv_digest(path):
+    """file_digest() of a CSV, taken from its sidecar if size and mtime match."""
+    st = os.stat(path)
+    try:
+        header, _ = read_sidecar_header(path + SIDECAR_SUFFIX)
+        if header["size"] == st.st_size and header["mtime"] == st.st_mtime_ns:
+            return header["sha1"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return file_digest(path)
+
+
+def update_sidecar_header(sidecar, header, header_offset):
+    """Replace the JSON header at the end of a sidecar."""
+    try:
+        with open(sidecar, "r+b") as f:
+            f.seek(header_offset)
+            f.write(json.dumps(header).encode())
+            f.truncate()
+    except OSError:
+        pass
+
+
+def load_csv(path):
+    """read_csv() with a memory-mapped binary sidecar next to the CSV.
+
+    The sidecar is SIDECAR_MAGIC, the offset of the JSON header at its
+    end and the table of stream_csv() in between, starting at
+    SIDECAR_TABLE_OFFSET. It is used as long as size and mtime of the
+    CSV are unchanged, or its content hash still matches.
+    """
+    sidecar = path + SIDECAR_SUFFIX
+    st = os.stat(path)
+    digest = None
+    try:
+        header, header_offset = read_sidecar_header(sidecar)
+        if header["size"] != st.st_size:
+            raise ValueError("size changed")
+        if header["mtime"] != st.st_mtime_ns:
+            digest = file_digest(path)
+            if header["sha1"] != digest:
+                raise ValueError("content changed")
+            # same content, with the new mtime it is not hashed again next time
+            header["mtime"] = st.st_mtime_ns
+            update_sidecar_header(sidecar, header, header_offset)
+        n_days, n_slots = len(header["days"]), len(header["times"])
+        if header_offset != SIDECAR_TABLE_OFFSET + n_days * 2 * n_slots * 4:
+            raise ValueError("truncated")
+        table = map_table(sidecar, SIDECAR_TABLE_OFFSET, n_days, n_slots)
+        touch(sidecar)
+        dates = [datetime.date.fromordinal(o) for o in header["days"]]
+        return (header["gps"], dates, header["times"], table[:, 0], table[:, 1])
+    except (OSError, ValueError, KeyError):
+        pass
+
+    tmp = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(SIDECAR_MAGIC.ljust(SIDECAR_TABLE_OFFSET, b"\0"))
+            gps_coords, dates, times = stream_csv(path, f)
+            header_offset = f.tell()
+            header = {"size": st.st_size,
+                      "mtime": st.st_mtime_ns,
+                      "sha1": digest or file_digest(path),
+                      "gps": gps_coords,
+                      "days": [d.toordinal() for d in dates],
+                      "times": times}
+            f.write(json.dumps(header).encode())
+            f.seek(len(SIDECAR_MAGIC))
+            f.write(header_offset.to_bytes(8, "little"))
+        os.replace(tmp, sidecar)
+        # mapped first, the eviction may remove this sidecar as well
+        table = map_table(sidecar, SIDECAR_TABLE_OFFSET, len(dates), len(times))
+        evict_cache(os.path.dirname(os.path.abspath(sidecar)), SIDECAR_SUFFIX, magic=SIDECAR_MAGIC)
+    except OSError:
+        # e.g. a read-only directory, just parse again next time
+        return read_csv(path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return (gps_coords, dates, times, table[:, 0], table[:, 1])
+
+
+def year_slices(dates):
+    """(year, first row, row after the last) for the years of a table."""
+    slices = []
+    start = 0
+    for i in range(1, len(dates) + 1):
+        if i == len(dates) or dates[i].year != dates[start].year:
+            slices.append((dates[start].year, start, i))
+            start = i
+    return slices
+
+
+def day_of_year(date):
+    """Index 0..365 of the day, Feb 29 has its own index in every year."""
+    return (datetime.date(2000, date.month, date.day) - datetime.date(2000, 1, 1)).days
+
+
+# days of the table averaged at once, see average_years()
+AVERAGE_CHUNK_DAYS = 64
+
+
+def average_years(dates, elevation, azimuth):
+    """Mean sun position per day of the year and time slot over all years.
+
+    The table is read in chunks of days into running sums, so the memory
+    does not grow with the number of years. The azimuth is averaged as
+    a direction. A slot is only kept if the sun is above the horizon in
+    the majority of the years. Returns (dates, elevation, azimuth) for
+    the days of the first year.
+    """
+    n_slots = elevation.shape[1]
+    if not len(dates):
+        return ([], np.asarray(elevation, dtype=float), np.asarray(azimuth, dtype=float))
+    doy = np.array([day_of_year(d) for d in dates], dtype=np.intp)
+    days = np.bincount(doy, minlength=366)
+    el_sum = np.zeros((366, n_slots))
+    x_sum = np.zeros((366, n_slots))
+    y_sum = np.zeros((366, n_slots))
+    count = np.zeros((366, n_slots), dtype=np.int32)
+
+    for start in range(0, len(dates), AVERAGE_CHUNK_DAYS):
+        rows = doy[start:start + AVERAGE_CHUNK_DAYS]
+        el = np.asarray(elevation[start:start + AVERAGE_CHUNK_DAYS], dtype=float)
+        az = np.radians(np.asarray(azimuth[start:start + AVERAGE_CHUNK_DAYS], dtype=float))
+        valid = ~np.isnan(el) & ~np.isnan(az)
+        np.add.at(el_sum, rows, np.where(valid, el, 0.0))
+        np.add.at(x_sum, rows, np.where(valid, np.cos(az), 0.0))
+        np.add.at(y_sum, rows, np.where(valid, np.sin(az), 0.0))
+        np.add.at(count, rows, valid)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        el_mean = el_sum / count
+    az_mean = np.mod(np.degrees(np.arctan2(y_sum, x_sum)), 360.0)
+    hidden = count * 2 <= days[:, np.newaxis]
+    el_mean[hidden] = np.nan
+    az_mean[hidden] = np.nan
+
+    year = dates[0].year
+    first = datetime.date(year, 1, 1).toordinal()
+    last = datetime.date(year, 12, 31).toordinal()
+    out_dates = [d for d in map(datetime.date.fromordinal, range(first, last + 1))
+                 if days[day_of_year(d)]]
+    rows = [day_of_year(d) for d in out_dates]
+    return (out_dates, el_mean[rows], az_mean[rows])
+
+
+# SundialCore.best_layout() looks at this many sun positions at most,
+# tries these ratios of bounding_box to length (LAYOUT_CHUNK at once) and
+# lengths up to LAYOUT_MAX_LENGTH, and keeps LAYOUT_MARGIN mm of the paper free
+LAYOUT_CELLS = 5000
+LAYOUT_RATIOS = np.arange(1.05, 12.0, 0.02)
+LAYOUT_CHUNK = 32
+LAYOUT_MAX_LENGTH = 100
+LAYOUT_MARGIN = 10
+
+
+# parameters of SundialCore, the options of sundial.py use the same names
+DEFAULTS = {
+    "source": "csv",
+    "csvfile": None,
+    "latitude": 48.2082,
+    "longitude": 16.3738,
+    "timezone": 1.0,
+    "year": 0,
+    "step": 15,
+    "length": 27,
+    "box_mode": False,
+    "day_start": 6,
+    "day_end": 18,
+    "sundial_type": "both",
+    "solstice_summer": "06-21",
+    "solstice_winter": "12-21",
+    "offset_x": 150,
+    "offset_y": 150,
+    "bounding_box": 130,
+    "simplify": 0.0,
+    "bezier": False,
+    "bezier_tolerance": 0.1,
+    "multi_year": "first",
+    "place_labels": False,
+    "projection": "horizontal",
+    "wall_azimuth": 180.0,
+    "optimize_layout": False,
+    "layout_keep": 0.85,
+}
+
+
+class SundialCore:
+        """Reads the sun path and projects it into the lines of the dial.
+
+        The parameters are the keys of PARAMS, they are plain attributes.
+        """
+        PARAMS = DEFAULTS
+
+        def __init__(self, **params):
+                self.stats = Stats()
+                self.keep_points = set()
+                self.configure(**{**self.PARAMS, **params})
+
+        def configure(self, **params):
+            """Set parameters, see PARAMS."""
+            for name, value in params.items():
+                if name not in self.PARAMS:
+                    raise TypeError(f"unknown parameter {name!r}")
+                setattr(self, name, value)
+
+        @property
+        def fontsize(self):
+            # some rough estimation for the fontsize
+            return self.length / 10
+
+        @property
+        def fontsize_x_spacing(self):
+            return self.fontsize
+
+        @property
+        def fontsize_y_spacing(self):
+            return self.fontsize * 1.3
+
+        @property
+        def folded(self):
+            """True if the dial is a box, only a horizontal dial can be."""
+            return self.box_mode and self.projection == "horizontal"
+
+        def map_coords(self, length, el, az, box_mode = None):
+            x, y, face = self.map_coords_batch(length, [el], [az], box_mode)
+            return (float(x[0]), float(y[0]))
+
+        def map_coords_batch(self, length, el, az, box_mode = None, latitude = None):
+            """Project arrays of elevation/azimuth (degrees) onto the paper.
+
+            The kernel PROJECTIONS[projection] does the projection onto the
+            plate of the dial, latitude defaults to the parameter.
+            Returns the x and y arrays plus an array with the FACE_* the
+            point ended up on (always FACE_FLAT unless the dial is folded).
+            """
+            el = np.asarray(el, dtype=float)
+            az = np.asarray(az, dtype=float)
+            if latitude is None:
+                latitude = self.latitude
+            x, y = PROJECTIONS[self.projection](self, length, el, az, latitude)
+            face = np.full(x.shape, FACE_FLAT, dtype=np.int8)
+            if box_mode is None:
+                box_mode = self.box_mode
+
+            if box_mode and self.projection == "horizontal":
+                x, y, face = self.fold_box(length, x, y)
+
+            return (x, y, face)
+
+        def fold_box(self, length, x, y, flat_size = None):
+            """Move the points beyond the folds of the box onto its sides.
+
+            x and y are ground coordinates, the shadow on an endless flat
+            surface. flat_size (half the bottom of the box) defaults to
+            bounding_box - length, an array of sizes is broadcast against
+            the points. Returns the x, y and face arrays on the paper.
+            """
+            if flat_size is None:
+                flat_size = self.bounding_box - self.length
+            face = np.full(np.broadcast_shapes(np.shape(x), np.shape(flat_size)), FACE_FLAT, dtype=np.int8)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                tan_az = (y - self.offset_y) / (x - self.offset_x)
+                tan_el = length / np.hypot(x - self.offset_x, y - self.offset_y)
+                # the faces are checked in this order on purpose, a point
+                # moved to one face may still be moved by the next check
+                top = y < (self.offset_y - flat_size)
+                x_out = (1/tan_az) * flat_size
+                d2 = np.hypot(x_out, flat_size)
+                y_out = length - tan_el * d2
+                y = np.where(top, self.offset_y - flat_size - y_out, y)
+                x = np.where(top, self.offset_x - x_out, x)
+                face[top] = FACE_TOP
+
+                left = x < self.offset_x - flat_size
+                y_out = tan_az * flat_size
+                d2 = np.hypot(y_out, flat_size)
+                x_out = length - tan_el * d2
+                y = np.where(left, self.offset_y - y_out, y)
+                x = np.where(left, self.offset_x - flat_size - x_out, x)
+                face[left] = FACE_LEFT
+
+                bottom = y > (self.offset_y + flat_size)
+                x_out = (1/tan_az) * flat_size
+                d2 = np.hypot(x_out, flat_size)
+                y_out = length - tan_el * d2
+                y = np.where(bottom, self.offset_y + flat_size + y_out, y)
+                x = np.where(bottom, self.offset_x + x_out, x)
+                face[bottom] = FACE_BOTTOM
+
+            return (x, y, face)
+
+        def in_day(self, h, m, s):
+            """True if the time of day is within day_start and day_end."""
+            if h < self.day_start or h > self.day_end:
+                return False
+            if h == self.day_end and (m != 0 or s != 0):
+                return False
+            return True
+
+        def slots_in_day(self, times):
+            """Indexes of the times ("HH:MM:SS") within day_start and day_end."""
+            return [i for i, t in enumerate(times)
+                    if self.in_day(*[int(v) for v in t.split(":")])]
+
+        def sun_grid(self, dates, times, el, az, latitude = None):
+            """Project a day x time slot table into a SunPathGrid.
+
+            Only the time slots within the configured day are kept.
+            latitude is the one of the table, see map_coords_batch().
+            """
+            with self.stats.stage("cells"):
+                slots = self.slots_in_day(times)
+                if self.stats.enabled:
+                    with_sun = np.count_nonzero(~np.isnan(np.asarray(el, dtype=float)))
+                    self.stats.count("rows", len(dates))
+                    self.stats.count("cells_with_sun", with_sun)
+                el = np.asarray(el, dtype=float)[:, slots]
+                az = np.asarray(az, dtype=float)[:, slots]
+                # NaN: below the horizon or no data
+                valid = ~np.isnan(el) & ~np.isnan(az) & (el != 0) & (az != 0)
+                if self.stats.enabled:
+                    self.stats.count("cells_in_day", np.count_nonzero(valid))
+                    self.stats.count("cells_skipped_by_day", with_sun - np.count_nonzero(~np.isnan(el)))
+
+            with self.stats.stage("projection"):
+                gx = np.full(el.shape, np.nan)
+                gy = np.full(el.shape, np.nan)
+                face = np.full(el.shape, FACE_FLAT, dtype=np.int8)
+                gx[valid], gy[valid], _ = self.map_coords_batch(self.length, el[valid], az[valid],
+                                                                box_mode=False, latitude=latitude)
+                x, y, box = gx, gy, None
+                if self.folded:
+                    x = np.full(el.shape, np.nan)
+                    y = np.full(el.shape, np.nan)
+                    x[valid], y[valid], face[valid] = self.fold_box(self.length, gx[valid], gy[valid])
+                    box = (self.offset_x, self.offset_y, self.bounding_box - self.length, self.length)
+            with self.stats.stage("bounding_box"):
+                with np.errstate(invalid='ignore'):
+                    inside = (np.abs(x - self.offset_x) <= self.bounding_box) & \
+                             (np.abs(y - self.offset_y) <= self.bounding_box)
+            self.stats.count("cells_outside_bounding_box", np.count_nonzero(valid & ~inside))
+
+            return SunPathGrid(dates,
+                               [times[i][:5] for i in slots],
+                               np.array([times[i].endswith(":00:00") for i in slots], dtype=bool),
+                               x, y, face, valid & inside,
+                               gx=gx, gy=gy, box=box)
+
+        def computed_table(self):
+            """Table like sun_path() from cached_sun_path()."""
+            year = self.year or datetime.date.today().year
+            params = (self.latitude, self.longitude,
+                      self.timezone, year, self.step)
+            dates, times, el, az = loaded_table(("compute",) + params, cached_sun_path, *params)
+            gps_coords = f"{self.latitude:.4f},{self.longitude:.4f}"
+            return (gps_coords, dates, times, el, az)
+
+        def csv_table(self, path):
+            """Table like load_csv() of a sunearthtools CSV."""
+            st = os.stat(path)
+            key = ("csv", os.path.abspath(path), st.st_size, st.st_mtime_ns)
+            return loaded_table(key, load_csv, path)
+
+        def input_fingerprint(self):
+            """Identifies the sun path data, changes if the data changes."""
+            if self.source == 'compute':
+                year = self.year or datetime.date.today().year
+                return json.dumps(["compute", SUN_PATH_VERSION, self.latitude, self.longitude,
+                                   self.timezone, year, self.step])
+            return "csv:" + csv_digest(self.csvfile)
+
+        def collect_curves(self):
+            """Read, project and sort the sun positions into SunCurves.
+
+            The table is processed one year at a time, only the curves are
+            kept.
+            """
+            with self.stats.stage("load"):
+                gps_coords, dates, times, el, az = self.load_table()
+            latitude = self.dial_latitude(gps_coords)
+            curves = None
+            for year_dates, year_el, year_az in self.year_tables(dates, el, az):
+                grid = self.sun_grid(year_dates, times, year_el, year_az, latitude)
+                with self.stats.stage("bucket"):
+                    year_curves = self.bucket_curves(gps_coords, grid)
+                if curves is None:
+                    curves = year_curves
+                else:
+                    curves.overlays.append(year_curves)
+            if curves is None:
+                # a table without days, only the template is drawn
+                curves = SunCurves()
+                curves.gps_coords = gps_coords
+            return curves
+
+        def load_table(self):
+            """(gps_coords, dates, times, elevation, azimuth) of the configured source."""
+            if self.source == 'compute':
+                return self.computed_table()
+            return self.csv_table(self.csvfile)
+
+        def year_tables(self, dates, el, az):
+            """The (dates, elevation, azimuth) of every year to draw.
+
+            multi_year "first" only uses the first year of the table,
+            "overlay" every year on its own and "average" the mean of all
+            years, see average_years().
+            """
+            if self.multi_year == "average":
+                self.stats.count("years", len(year_slices(dates)))
+                with self.stats.stage("average"):
+                    table = average_years(dates, el, az)
+                yield table
+                return
+            for year, start, stop in year_slices(dates):
+                self.stats.count("years")
+                yield (dates[start:stop], el[start:stop], az[start:stop])
+                if self.multi_year != "overlay":
+                    return
+
+        def dial_latitude(self, gps_coords=None):
+            """Latitude the projection uses, None if it does not depend on one.
+
+            It is taken from the coordinates of the table (gps_coords, the
+            table is loaded without them), the latitude parameter is only
+            used to compute a table. Raises DialError if the coordinates
+            have no latitude.
+            """
+            if self.projection not in LATITUDE_PROJECTIONS:
+                return None
+            if gps_coords is None:
+                gps_coords = self.load_table()[0]
+            latitude = coords_latitude(gps_coords)
+            if latitude is None:
+                raise DialError(f"the {self.projection} dial needs the latitude, "
+                                 f"the sun path data has none in its coordinates {gps_coords!r}")
+            return latitude
+
+        def layout_cells(self):
+            """Sun positions for best_layout(), projected with length 1.
+
+            The positions within the day of the first table of year_tables()
+            (at most LAYOUT_CELLS, evenly taken), relative to the stick and
+            on the ground, not folded. Positions the plate does not get
+            are left out.
+            """
+            gps_coords, dates, times, el, az = self.load_table()
+            dates, el, az = next(self.year_tables(dates, el, az))
+            slots = self.slots_in_day(times)
+            el = np.asarray(el, dtype=float)[:, slots].ravel()
+            az = np.asarray(az, dtype=float)[:, slots].ravel()
+            valid = ~np.isnan(el) & ~np.isnan(az) & (el != 0) & (az != 0)
+            step = max(1, math.ceil(np.count_nonzero(valid) / LAYOUT_CELLS))
+            el = el[valid][::step]
+            az = az[valid][::step]
+            x, y, _ = self.map_coords_batch(1, el, az, box_mode=False,
+                                            latitude=self.dial_latitude(gps_coords))
+            on_plate = ~np.isnan(x) & ~np.isnan(y)
+            return (x[on_plate] - self.offset_x, y[on_plate] - self.offset_y)
+
+        def template_extent(self):
+            """Rough (x0, y0, x1, y1) of draw_template() around the stick, per length."""
+            if self.projection == "equatorial":
+                return (-math.pi, -0.6, math.pi, 0.5)
+            d = math.sin(math.pi / 4)
+            x_15 = math.cos(math.pi / 12)
+            y_15 = math.sin(math.pi / 12)
+            # three lines of cut instructions above the triangle
+            return (0.0, -d - y_15 - 4 * 0.13, d + x_15 + y_15 + 0.1, 1.13)
+
+        def best_layout(self, width, height):
+            """length, offsets and bounding_box of the largest dial on the paper.
+
+            The sun positions of layout_cells() scale with the length, so
+            every ratio of bounding_box to length in LAYOUT_RATIOS is
+            projected only once: the dial of a ratio is the extent of the
+            positions within the bounding box (and on the box if folded)
+            with room for the labels, plus the template. Of all ratios and
+            lengths fitting on the paper (width x height mm) which keep at
+            least layout_keep of the positions, the largest one wins. It is
+            centered on the paper. Returns the parameters for configure(),
+            raises DialError if no dial fits.
+            """
+            with self.stats.stage("layout"):
+                x, y = self.layout_cells()
+                if not len(x):
+                    raise DialError("no sun positions within the day to lay out")
+                x = x[np.newaxis]
+                y = y[np.newaxis]
+                # the labels at the ends of the lines, fontsize is length / 10
+                pad_x = text_box(0, 0, "September", "start", 0.1)[2] + 0.1
+                pad_y = 2 * 0.13
+                keep = np.zeros(len(LAYOUT_RATIOS))
+                extent = np.zeros((len(LAYOUT_RATIOS), 4))
+                for start in range(0, len(LAYOUT_RATIOS), LAYOUT_CHUNK):
+                    ratios = LAYOUT_RATIOS[start:start + LAYOUT_CHUNK, np.newaxis]
+                    if self.folded:
+                        fx, fy, _ = self.fold_box(1, x + self.offset_x, y + self.offset_y, ratios - 1)
+                        fx = fx - self.offset_x
+                        fy = fy - self.offset_y
+                    else:
+                        fx, fy = x, y
+                    with np.errstate(invalid='ignore'):
+                        inside = (np.abs(fx) <= ratios) & (np.abs(fy) <= ratios)
+                    rows = slice(start, start + len(ratios))
+                    keep[rows] = inside.mean(axis=1)
+                    extent[rows, 0] = np.where(inside, fx, np.inf).min(axis=1) - pad_x
+                    extent[rows, 1] = np.where(inside, fy, np.inf).min(axis=1) - pad_y
+                    extent[rows, 2] = np.where(inside, fx, -np.inf).max(axis=1) + pad_x
+                    extent[rows, 3] = np.where(inside, fy, -np.inf).max(axis=1) + pad_y
+
+                tx0, ty0, tx1, ty1 = self.template_extent()
+                if self.folded:
+                    # the sides of the box
+                    tx0 = -LAYOUT_RATIOS
+                    ty0 = -LAYOUT_RATIOS
+                    ty1 = LAYOUT_RATIOS
+                extent[:, 0] = np.minimum(extent[:, 0], tx0)
+                extent[:, 1] = np.minimum(extent[:, 1], ty0)
+                extent[:, 2] = np.maximum(extent[:, 2], tx1)
+                extent[:, 3] = np.maximum(extent[:, 3], ty1)
+
+                # every ratio with every length
+                lengths = np.arange(1, LAYOUT_MAX_LENGTH + 1)
+                w = (extent[:, 2] - extent[:, 0])[:, np.newaxis] * lengths
+                h = (extent[:, 3] - extent[:, 1])[:, np.newaxis] * lengths
+                bounding_box = np.floor(LAYOUT_RATIOS[:, np.newaxis] * lengths)
+                fits = (w <= width - 2 * LAYOUT_MARGIN) & (h <= height - 2 * LAYOUT_MARGIN) & \
+                       (bounding_box > lengths)
+                self.stats.count("layout_candidates", fits.size)
+                if not fits.any():
+                    raise DialError(f"no sundial fits on {width} x {height} mm")
+                kept = np.where(fits, keep[:, np.newaxis], -1.0)
+                wanted = kept >= min(self.layout_keep, kept.max())
+                i, j = np.unravel_index(np.argmax(np.where(wanted, w * h, -1.0)), w.shape)
+
+            length = int(lengths[j])
+            x0, y0, x1, y1 = extent[i] * length
+            return {"length": length,
+                    "bounding_box": int(bounding_box[i, j]),
+                    "offset_x": int(round((width - x0 - x1) / 2)),
+                    "offset_y": int(round((height - y0 - y1) / 2))}
+
+        def bucket_curves(self, gps_coords, grid):
+            """Take the hour and month lines out of the SunPathGrid of one year.
+
+            The hour lines are split at the solstices, the solstice days
+            still belong to the part before them.
+            """
+            curves = SunCurves()
+            curves.gps_coords = gps_coords
+            if not grid.valid.any():
+                return curves
+
+            curves.year = grid.dates[0].year
+            sdate = self.solstice_summer.split("-")
+            wdate = self.solstice_winter.split("-")
+            curves.summer_date = datetime.datetime(curves.year, int(sdate[0]), int(sdate[1]))
+            curves.winter_date = datetime.datetime(curves.year, int(wdate[0]), int(wdate[1]))
+            summer_i = grid.day_index(curves.summer_date)
+            winter_i = grid.day_index(curves.winter_date)
+
+            curves.hours_summer1 = grid.hour_lines(0, summer_i)
+            curves.hours_winter = grid.hour_lines(summer_i, winter_i)
+            curves.hours_summer2 = grid.hour_lines(winter_i)
+
+            for i, date in enumerate(grid.dates):
+                if date.day != 1:
+                    continue
+                cols = grid.day_slots(i)
+                if not len(cols):
+                    continue
+                curves.months[date.month] = grid.day_curve(date)
+                dots = [k for k, full_hour in enumerate(grid.full_hour[cols].tolist())
+                        if full_hour or k == 0]
+                curves.month_dots[date.month] = list(zip(grid.x[i, cols[dots]].tolist(),
+                                                         grid.y[i, cols[dots]].tolist()))
+            return curves
+
+        def label_positions(self, curves):
+            """Where the month and hour labels of the curves are drawn.
+
+            Returns {("month", m) or ("hour", "HH:MM", "start"/"end"):
+            (x, y, anchor)}. Without place_labels every label is at its
+            fixed offset, otherwise at the candidate position which
+            overlaps the least with the lines, dots and labels before it.
+            """
+            if curves.labels is not None:
+                return curves.labels
+            gap_x = self.fontsize_x_spacing
+            gap_y = self.fontsize_y_spacing
+
+            # (key, text, point, default position)
+            wanted = []
+            dots = []
+            for m, path in curves.months.items():
+                winter = m > curves.summer_date.month and m <= curves.winter_date.month
+                if self.sundial_type == ('winter_to_summer_only' if winter else 'summer_to_winter_only'):
+                    continue
+                x, y = path[0][:2]
+                default = (x - 3, y, 'end') if winter else (x + 3, y, 'start')
+                wanted.append((("month", m), calendar.month_name[m], (x, y), default))
+                dots += curves.month_dots[m]
+
+            if self.sundial_type != 'summer_to_winter_only':
+                labelled, start_i, end_i = curves.hours_summer1, -1, 0
+            else:
+                labelled, start_i, end_i = curves.hours_winter, 0, -1
+            for h, path in labelled.items():
+                # only label full hours
+                if not h.endswith(":00"):
+                    continue
+                x, y = path[start_i][:2]
+                wanted.append((("hour", h, "start"), h, (x, y), (x + gap_x, y, 'start')))
+                x, y = path[end_i][:2]
+                default_y = y + gap_y if y < self.offset_y else y
+                wanted.append((("hour", h, "end"), h, (x, y), (x - gap_x, default_y, 'end')))
+                dots += [path[start_i], path[end_i]]
+
+            curves.labels = {key: default for key, _, _, default in wanted}
+            if not self.place_labels:
+                return curves.labels
+
+            with self.stats.stage("labels"):
+                index = LabelIndex(self.fontsize * 2)
+                for c in [curves] + curves.overlays:
+                    lines = list(c.months.values())
+                    if self.sundial_type != 'summer_to_winter_only':
+                        lines += list(c.hours_summer1.values()) + list(c.hours_summer2.values())
+                    if self.sundial_type != 'winter_to_summer_only':
+                        lines += list(c.hours_winter.values())
+                    for path in lines:
+                        for part in split_at_cuts(path):
+                            index.add_line(part)
+                if self.folded:
+                    for size in (self.bounding_box - self.length, self.bounding_box):
+                        index.add_line([(self.offset_x + dx * size, self.offset_y + dy * size)
+                                        for dx, dy in ((1, -1), (-1, -1), (-1, 1), (1, 1))])
+                for p in dots:
+                    index.add_box((p[0] - 1, p[1] - 1, p[0] + 1, p[1] + 1), 100)
+
+                for key, text, (x, y), default in wanted:
+                    best = None
+                    for candidate in [default] + label_candidates(x, y, gap_x, self.fontsize):
+                        box = text_box(*candidate[:2], text, candidate[2], self.fontsize)
+                        cost = index.cost(box)
+                        if best is None or cost < best[0]:
+                            best = (cost, candidate, box)
+                            if cost == 0:
+                                break
+                    if best[1] != default:
+                        self.stats.count("labels_moved")
+                    curves.labels[key] = best[1]
+                    index.add_box(best[2], 1000)
+            return curves.labels
+
+        def simplified(self, path):
+            """Hour or month line simplified by the --simplify tolerance.
+
+            Points may carry the FACE_* as third value, the points next to
+            a fold of the box and the month dots are always kept.
+            """
+            if self.simplify <= 0:
+                return path
+            keep = []
+            for i, p in enumerate(path):
+                if (p[0], p[1]) in self.keep_points:
+                    keep.append(i)
+                elif len(p) > 2 and i > 0 and path[i - 1][2] != p[2]:
+                    keep.extend((i - 1, i))
+            return simplify_polyline(path, self.simplify, keep)
+
+        def curve_str(self, path):
+            """Path data of smooth curves through the points.
+
+            A new curve is started at every fold of the box (the FACE_* as
+            third value of the points), the vertex on the fold ends the
+            curve before it. At a cut of the box a new subpath starts.
+            """
+            parts = []
+            for piece in split_at_cuts(path):
+                if parts:
+                    parts.append("M")
+                parts.append(f"{piece[0][0]},{piece[0][1]}")
+                runs = [[piece[0]]]
+                for p in piece[1:]:
+                    runs[-1].append(p)
+                    if len(p) > 2 and p[2] != runs[-1][-2][2]:
+                        runs.append([p])
+                for run in runs:
+                    curves = fit_cubic_beziers(run, self.bezier_tolerance)
+                    if curves:
+                        parts.append("C " + " ".join(f"{c[k][0]},{c[k][1]}" for c in curves for k in (1, 2, 3)))
+            return " ".join(parts)
@@ -0,0 +1,548 @@
+"""Drawing the sundial as SVG, with or without Inkscape.
+
+SundialDrawing draws the SunCurves of sundial_core through a writer:
+TreeWriter adds lxml elements to a document (the Inkscape extension),
+StreamWriter writes every element to a file as soon as it is drawn,
+without building a tree. write_svg() draws a whole document that way:
+
+    with open("dial.svg", "w") as f:
+        write_svg(f, source="compute", latitude=48.2, longitude=16.37)
+"""
+
+import math
+import json
+import hashlib
+import calendar
+from xml.sax.saxutils import escape, quoteattr
+
+from sundial_core import SundialCore, DEFAULTS, split_at_cuts
+
+SVG_NS = "http://www.w3.org/2000/svg"
+INKSCAPE_NS = "http://www.inkscape.org/namespaces/inkscape"
+SODIPODI_NS = "http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd"
+# namespace of the attributes which tag the generated group, see SundialDrawing.parts
+SUNDIAL_NS = "https://github.com/schuellerf/sundial"
+# bump this if the drawing changes, every part is drawn again then
+SUNDIAL_VERSION = 1
+# options stored with the generated group
+DIAL_OPTIONS = ("csvfile", "source", "latitude", "longitude", "timezone", "year", "step",
+                "length", "box_mode", "day_start", "day_end", "sundial_type",
+                "solstice_summer", "solstice_winter", "offset_x", "offset_y", "bounding_box",
+                "css_classes", "simplify", "bezier", "bezier_tolerance", "multi_year",
+                "place_labels", "projection", "wall_azimuth", "optimize_layout", "layout_keep")
+
+# types of the parameters given as text, same as the options of sundial.py
+PARAM_TYPES = {"latitude": float, "longitude": float, "timezone": float,
+               "year": int, "step": int, "length": int, "day_start": int, "day_end": int,
+               "offset_x": int, "offset_y": int, "bounding_box": int,
+               "simplify": float, "bezier_tolerance": float, "wall_azimuth": float,
+               "layout_keep": float, "optimize_layout": bool,
+               "box_mode": bool, "css_classes": bool, "bezier": bool, "place_labels": bool}
+
+# 1px in mm, the width of the lines
+PX_MM = 25.4 / 96
+
+
+def sundial_attr(name):
+    return f"{{{SUNDIAL_NS}}}{name}"
+
+
+def inkscape_attr(name):
+    return f"{{{INKSCAPE_NS}}}{name}"
+
+
+def parse_params(values):
+    """Parameters of SundialDrawing from a dict of texts, e.g. a manifest row."""
+    params = {}
+    for name, value in values.items():
+        if value is None or value == "":
+            continue
+        if isinstance(value, str):
+            kind = PARAM_TYPES.get(name, str)
+            value = value == 'true' if kind is bool else kind(value)
+        params[name] = value
+    return params
+
+
+class TreeWriter:
+    """Adds the elements to an lxml tree, e.g. the document in Inkscape."""
+    def __init__(self):
+        from lxml import etree
+        self.etree = etree
+
+    def element(self, parent, tag, attribs, text=None):
+        elem = self.etree.SubElement(parent, f"{{{SVG_NS}}}{tag}", attribs)
+        if text is not None:
+            elem.text = text
+        return elem
+
+
+class StreamWriter:
+    """Writes every element to a text stream right away.
+
+    No tree is built: the parent of element() is ignored, elements end up
+    in the group last opened with start().
+    """
+    prefixes = {SVG_NS: "", INKSCAPE_NS: "inkscape:", SODIPODI_NS: "sodipodi:", SUNDIAL_NS: "sundial:"}
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.elements = 0
+
+    def qname(self, name):
+        """prefix:name of a "{namespace}name"."""
+        if name.startswith("{"):
+            ns, name = name[1:].split("}")
+            name = self.prefixes[ns] + name
+        return name
+
+    def attribs(self, attribs):
+        return "".join(f" {self.qname(name)}={quoteattr(str(value))}" for name, value in attribs.items())
+
+    def start(self, tag, attribs):
+        self.stream.write(f"<{self.qname(tag)}{self.attribs(attribs)}>\n")
+
+    def end(self, tag):
+        self.stream.write(f"</{self.qname(tag)}>\n")
+
+    def element(self, parent, tag, attribs, text=None):
+        self.elements += 1
+        tag = self.qname(tag)
+        if text is None:
+            self.stream.write(f"<{tag}{self.attribs(attribs)}/>\n")
+        else:
+            self.stream.write(f"<{tag}{self.attribs(attribs)}>{escape(text)}</{tag}>\n")
+
+
+class SundialDrawing(SundialCore):
+        """Draws the parts of the dial (see parts()) with self.writer."""
+        PARAMS = {**DEFAULTS, "css_classes": False}
+
+        def __init__(self, writer=None, **params):
+                SundialCore.__init__(self, **params)
+                self.writer = writer
+                self.txt_i = 1
+                self.id_prefix = ""
+                # serialized styles, see style_attribs()
+                self.style_cache = {}
+                self.style_classes = {}
+                self.stroke_width = PX_MM
+
+        def dial_params(self):
+            """The parameters stored with the dial, like the options of sundial.py."""
+            params = {}
+            for name in DIAL_OPTIONS:
+                value = getattr(self, name)
+                if isinstance(value, bool):
+                    value = "true" if value else "false"
+                params[name] = value
+            return params
+
+        def parts(self, fingerprint):
+            """(name, key, draw function) of the parts of the dial.
+
+            The key changes if one of the inputs of the part changes, a part
+            with the same key does not need to be drawn again.
+            """
+            geometry = [self.length, self.box_mode, self.offset_x, self.offset_y,
+                        self.bounding_box, self.css_classes, self.projection]
+            curve_inputs = geometry + [fingerprint, self.day_start, self.day_end, self.sundial_type,
+                                       self.solstice_summer, self.solstice_winter,
+                                       self.simplify, self.bezier, self.bezier_tolerance,
+                                       self.multi_year, self.place_labels, self.wall_azimuth,
+                                       self.dial_latitude()]
+            parts = [("template", geometry, self.draw_template),
+                     ("location", geometry + [fingerprint], self.draw_location),
+                     ("months", curve_inputs, self.draw_months),
+                     ("hours", curve_inputs, self.draw_hours)]
+            return [(name, hashlib.sha1(json.dumps([name, SUNDIAL_VERSION] + inputs).encode()).hexdigest(), draw)
+                    for name, inputs, draw in parts]
+
+        def start_part(self, group_id, name, key):
+            """Reset the ids and styles for a new part, returns the attributes of its group."""
+            self.txt_i = 1
+            self.id_prefix = f"{group_id}-{name}-"
+            self.style_classes = {}
+            return {'id': f"{group_id}-{name}",
+                    inkscape_attr('label'): name.capitalize(),
+                    sundial_attr("part"): name,
+                    sundial_attr("key"): key}
+
+        def style_attribs(self, style):
+            """The attributes to apply a style dict to an element.
+
+            Every distinct style is serialized only once. With css_classes
+            it is referenced by a class instead, see write_styles().
+            """
+            key = tuple(style.items())
+            style_str = self.style_cache.get(key)
+            if style_str is None:
+                style_str = ";".join(f"{k}:{v}" for k, v in sorted(style.items()))
+                self.style_cache[key] = style_str
+            if not self.css_classes:
+                return {'style': style_str}
+
+            name = self.style_classes.get(style_str)
+            if name is None:
+                # named by content, so several dials in one document agree
+                name = "sundial-" + hashlib.sha1(style_str.encode()).hexdigest()[:8]
+                self.style_classes[style_str] = name
+            return {'class': name}
+
+        def write_styles(self, parent):
+            """Add the <style> element for the classes used by style_attribs()."""
+            if not self.style_classes:
+                return
+            rules = [f".{name} {{ {style_str} }}" for style_str, name in self.style_classes.items()]
+            self.writer.element(parent, 'style', {'type': 'text/css'}, "\n".join(rules))
+
+        def new_path(self, parent, path, color, name=None, close= False, dashed=False, smooth=False):
+            if name is None:
+                name = name = f"path{self.txt_i}"
+                self.txt_i += 1
+
+            if smooth:
+                self.stats.curve(name, len(path))
+            if smooth and self.bezier:
+                path_str = self.curve_str(path)
+            else:
+                path_str = " M ".join(" ".join(f"{p[0]},{p[1]}" for p in part)
+                                      for part in split_at_cuts(path))
+            style   = {
+                    'stroke'        : color,
+                    'stroke-width': self.stroke_width,
+                     'fill'          : 'none',
+                     'stroke-linejoin':'round'
+                   }
+
+            if dashed:
+                style['stroke-miterlimit'] = 4
+                style['stroke-dasharray'] = "1.58749792,1.58749792"
+                style['stroke-dashoffset'] = 0
+
+            if close:
+                close_str = ' z'
+            else:
+                close_str = ''
+
+            attribs = {**self.style_attribs(style),
+                    inkscape_attr('label') : name,
+                    'stroke-linecap': 'round',
+                    'd' : f'M {path_str}{close_str}'}
+
+            self.writer.element(parent, 'path', attribs)
+
+        def new_circle(self, parent, x,y, color=None, name=None, fill=True):
+            if color is None:
+                color = '#000000'
+
+            if name is None:
+                name = f"{self.id_prefix}circle{self.txt_i}"
+                self.txt_i += 1
+
+            style   = {
+                    'stroke'        : color,
+                     'stroke-width': '0.1px',
+                   }
+
+            if fill:
+                style['fill'] = color
+                style['fill-opacity'] = '1'
+            else:
+                style['fill'] = 'none'
+                style['fill-opacity'] = '1'
+
+            attribs = {**self.style_attribs(style),
+                    'id' : name,
+                    'cx': str(x),
+                    'cy': str(y),
+                    'rx': '1',
+                    'ry': '1'}
+
+            self.writer.element(parent, 'ellipse', attribs)
+
+        def new_text(self, parent, name, x,y, text, anchor="start", rotate=None, fontsize=None):
+            if not fontsize:
+                # just some estimation
+                fontsize = self.fontsize
+
+            style   = {
+                    'font-size'    : str(fontsize),
+                    'font-family'  : 'sans-serif',
+                     'stroke-width':0.2,
+                   }
+            if name is None:
+                name = f"{self.id_prefix}text{self.txt_i}"
+                self.txt_i += 1
+            attribs = { **self.style_attribs(style),
+                        'text-anchor': anchor,
+                        'id': name }
+            if rotate:
+                attribs['transform'] = f"translate({x},{y}) rotate({rotate})"
+            else:
+                attribs['x'] = str(x)
+                attribs['y'] = str(y)
+
+            self.writer.element(parent, 'text', attribs, text)
+
+        def draw_template(self, parent, curves=None):
+            """Reference length, cut instructions and the box."""
+            # just a shorter variable name
+            txt_x_gap = self.fontsize_x_spacing
+            txt_y_gap = self.fontsize_y_spacing
+            color = '#000000'
+
+            x = self.offset_x
+            y = self.offset_y
+            l = self.length
+            d = l * math.sin(math.pi / 4) # length l in 45° angle
+            y_15 = l * math.sin(math.pi / 12) # length l in 15° angle
+            x_15 = l * math.cos(math.pi / 12) # length l in 15° angle
+            hgt = math.sqrt(3*math.pow(d,2))
+
+            if self.projection == "equatorial":
+                self.new_path(parent, [(x     , y),
+                                       (x, y + l)], color='#909090', name="Reference length")
+                self.new_text(parent, None, x + 1, y + l, "Ring radius reference", anchor='start')
+                # the band of the ring, the highest declination of the sun is at l * 0.43
+                band = l / 2
+                self.new_path(parent, [(x - math.pi * l, y - band),
+                                       (x + math.pi * l, y - band),
+                                       (x + math.pi * l, y + band),
+                                       (x - math.pi * l, y + band)], color, close=True, dashed=True, name="Ring")
+                self.new_text(parent, None, x - math.pi * l, y - band - 1, "Cut on dashed lines, roll into a ring with the lines inside", anchor='start')
+                return
+
+            self.new_path(parent, [(x     , y),
+                                   (x, y + l)], color='#909090', name="Reference length")
+            self.new_text(parent, None, x + 1, y + l, f"Stick height reference", anchor='start')
+
+            # Cut instructions:
+            self.new_path(parent, [(x + d, y + d),
+                                   (x    , y)], color, close=False, name="Places of triangle 1")
+
+            self.new_path(parent, [(x    , y),
+                                   (x + d, y - d)], color, close=False, dashed=True, name="Places of triangle 2")
+
+            self.new_path(parent, [(x + d, y + d),
+                                   (x + d , y - d),
+                                   (x + d + hgt, y )], color)
+
+            self.new_path(parent, [(x + d + hgt, y),
+                                   (x + d, y + d)], color, close=False, dashed=True)
+
+            self.new_path(parent, [(x + d , y - d),
+                                   (x + d + x_15, y - d - y_15),
+                                   (x + d + hgt, y)], color, close=False, dashed=True)
+
+            self.new_text(parent, None, x + d + x_15 - txt_x_gap, y - d - y_15 - 1 - 2 * txt_y_gap, f"Cut on dashed lines,", anchor='end')
+            self.new_text(parent, None, x + d + x_15 - txt_x_gap, y - d - y_15 - 1 - 1 * txt_y_gap, f"Bend on solid lines,", anchor='end')
+            self.new_text(parent, None, x + d + x_15 - txt_x_gap, y - d - y_15 - 1 - 0 * txt_y_gap, f"tape to numbers", anchor='end')
+            self.new_text(parent, None, x + d/2, y - d/2 + txt_x_gap, f"1", anchor='start')
+            self.new_text(parent, None, x + d + x_15/2, y - d - y_15 / 2 + txt_y_gap, f"1", anchor='start')
+
+            self.new_text(parent, None, x + d/2, y - d/2 - txt_y_gap, f"2", anchor='end')
+            self.new_text(parent, None, x + d + x_15 + y_15 / 2 - 1, y - d - y_15 + x_15/2, f"2", anchor='end')
+
+        
+            if self.folded:
+                x_right_end = x + d + x_15 + y_15 + txt_x_gap
+                self.new_path(parent, [(x_right_end, y - self.bounding_box + l),
+                                       (x - self.bounding_box + l, y - self.bounding_box + l),
+                                       (x - self.bounding_box + l, y + self.bounding_box - l),
+                                       (x_right_end, y + self.bounding_box - l)], color, close=False)
+                self.new_text(parent, None, x_right_end, y - self.bounding_box + l + 2, f"https://github.com/schuellerf/sundial", anchor='end', rotate=-90)
+
+                self.new_path(parent, [(x - self.bounding_box + l, y - self.bounding_box + l),
+                                       (x - self.bounding_box, y - self.bounding_box + l)], color, close=False, dashed=True)
+                self.new_text(parent, None, x - self.bounding_box + txt_x_gap, y - self.bounding_box + l + txt_y_gap, f"3", anchor='start')
+
+                self.new_path(parent, [(x - self.bounding_box + l, y + self.bounding_box - l),
+                                       (x - self.bounding_box, y + self.bounding_box - l)], color, close=False, dashed=True)
+                self.new_text(parent, None, x - self.bounding_box + txt_x_gap, y + self.bounding_box - l - txt_y_gap, f"4", anchor='start')
+
+                self.new_path(parent, [(x - self.bounding_box + l, y - self.bounding_box + l),
+                                       (x - self.bounding_box + l, y - self.bounding_box)], color, close=False, dashed=True)
+                self.new_text(parent, None, x - self.bounding_box + l + txt_x_gap, y - self.bounding_box + txt_y_gap, f"3", anchor='start')
+
+                self.new_path(parent, [(x - self.bounding_box + l, y + self.bounding_box - l),
+                                       (x - self.bounding_box + l, y + self.bounding_box)], color, close=False, dashed=True)
+                self.new_text(parent, None, x - self.bounding_box + l + txt_x_gap, y + self.bounding_box - txt_y_gap, f"4", anchor='start')
+
+                # Box outer border
+                self.new_path(parent, [(x_right_end, y - self.bounding_box),
+                                       (x - self.bounding_box + l, y - self.bounding_box)], color, close=False, dashed=True)
+                self.new_path(parent, [(x - self.bounding_box, y - self.bounding_box + l),
+                                       (x - self.bounding_box, y + self.bounding_box - l)], color, close=False, dashed=True)
+                self.new_path(parent, [(x - self.bounding_box + l, y + self.bounding_box),
+                                       (x_right_end, y + self.bounding_box)], color, close=False, dashed=True)
+
+        def draw_location(self, parent, curves):
+            """GPS coordinates of the sun path data."""
+            txt_x_gap = self.fontsize_x_spacing
+            txt_y_gap = self.fontsize_y_spacing
+            x = self.offset_x
+            y = self.offset_y
+            d = self.length * math.sin(math.pi / 4) # length l in 45° angle
+            # 1.4 as an approximation as the text is tilted
+            self.new_text(parent, None, x + d + txt_x_gap/1.4, y + d - txt_y_gap/1.4, f"{curves.gps_coords}", anchor='start', rotate=-30)
+
+        def draw_months(self, parent, curves):
+            """Month lines with their names and dots."""
+            months = curves.months
+            month_dots = curves.month_dots
+            summer_date = curves.summer_date
+            winter_date = curves.winter_date
+            labels = self.label_positions(curves)
+            self.keep_points = {p for dots in month_dots.values() for p in dots}
+            for m in months:
+                if m > summer_date.month and m <= winter_date.month:
+                    if self.sundial_type == 'winter_to_summer_only':
+                        continue
+                    color = '#000000'
+                else:
+                    if self.sundial_type == 'summer_to_winter_only':
+                        continue
+                    color = '#FF0000'
+
+                self.new_path(parent, self.simplified(months[m]), color, f"Month {m}", smooth=True)
+                x, y, anchor = labels[("month", m)]
+                self.new_text(parent, None, x, y, f"{calendar.month_name[m]}", anchor=anchor)
+                for p in month_dots[m]:
+                    self.new_circle(parent, p[0], p[1], color)
+
+            # further years only as lines
+            for other in curves.overlays:
+                self.keep_points = {p for dots in other.month_dots.values() for p in dots}
+                for m, path in other.months.items():
+                    winter = m > other.summer_date.month and m <= other.winter_date.month
+                    if self.sundial_type == ('winter_to_summer_only' if winter else 'summer_to_winter_only'):
+                        continue
+                    color = '#000000' if winter else '#FF0000'
+                    self.new_path(parent, self.simplified(path), color, f"Month {m} {other.year}", smooth=True)
+
+        def draw_hours(self, parent, curves):
+            """Hour lines with their labels."""
+            labels = self.label_positions(curves)
+            hours_summer1 = curves.hours_summer1
+            hours_summer2 = curves.hours_summer2
+            hours_winter = curves.hours_winter
+            self.keep_points = {p for dots in curves.month_dots.values() for p in dots}
+            if self.sundial_type != 'summer_to_winter_only':
+                for h in hours_summer1:
+                    if h.endswith(":00"):
+                        color = '#FF0000'
+                    else:
+                        color = '#FFBEBE'
+                    self.new_path(parent, self.simplified(hours_summer1[h]), color, f"{h}h", smooth=True)
+
+                    # only label full hours
+                    if not h.endswith(":00"):
+                        continue
+
+                    coord = hours_summer1[h][-1]
+                    self.new_circle(parent, coord[0], coord[1], color, fill=False)
+                    x, y, anchor = labels[("hour", h, "start")]
+                    self.new_text(parent, None, x, y, f"{h}", anchor=anchor)
+
+                    coord = hours_summer1[h][0]
+                    self.new_circle(parent, coord[0], coord[1], color, fill=False)
+                    x, y, anchor = labels[("hour", h, "end")]
+                    self.new_text(parent, None, x, y, f"{h}", anchor=anchor)
+
+                for h in hours_summer2:
+                    if h.endswith(":00"):
+                        color = '#FF0000'
+                    else:
+                        color = '#FFBEBE'
+
+                    self.new_path(parent, self.simplified(hours_summer2[h]), color, f"{h}", smooth=True)
+                    #connect both
+                    if h in hours_summer1:
+                        self.new_path(parent, [hours_summer2[h][-1],hours_summer1[h][0]], color, f"{h}")
+
+            if self.sundial_type != 'winter_to_summer_only':
+                for h in hours_winter:
+                    if h.endswith(":00"):
+                        color = '#000000'
+                    else:
+                        color = '#C6C6C6'
+
+                    self.new_path(parent, self.simplified(hours_winter[h]), color, f"{h}", smooth=True)
+
+                    # only label full hours
+                    if not h.endswith(":00"):
+                        continue
+                    if self.sundial_type != 'both':
+
+                        coord = hours_winter[h][0]
+                        self.new_circle(parent, coord[0], coord[1], color, fill=False)
+                        x, y, anchor = labels[("hour", h, "start")]
+                        self.new_text(parent, None, x, y, f"{h}", anchor=anchor)
+
+                        coord = hours_winter[h][-1]
+                        self.new_circle(parent, coord[0], coord[1], color, fill=False)
+                        x, y, anchor = labels[("hour", h, "end")]
+                        self.new_text(parent, None, x, y, f"{h}", anchor=anchor)
+
+            # further years only as lines, the analemmas of all years side by side
+            for other in curves.overlays:
+                self.keep_points = {p for dots in other.month_dots.values() for p in dots}
+                lines = []
+                if self.sundial_type != 'summer_to_winter_only':
+                    lines += [(other.hours_summer1, '#FF0000', '#FFBEBE'),
+                              (other.hours_summer2, '#FF0000', '#FFBEBE')]
+                if self.sundial_type != 'winter_to_summer_only':
+                    lines.append((other.hours_winter, '#000000', '#C6C6C6'))
+                for hours, hour_color, color in lines:
+                    for h, path in hours.items():
+                        if h.endswith(":00"):
+                            color_h = hour_color
+                        else:
+                            color_h = color
+                        self.new_path(parent, self.simplified(path), color_h, f"{h} {other.year}", smooth=True)
+
+
+def write_svg(stream, width=297, height=420, **params):
+    """Draw a sundial into a new SVG document of width x height mm.
+
+    The elements are written to the stream while they are drawn, see
+    StreamWriter. With optimize_layout the dial is laid out for the
+    page first, see SundialCore.best_layout(). Returns the
+    SundialDrawing, e.g. for its stats.
+    """
+    writer = StreamWriter(stream)
+    dial = SundialDrawing(writer, **params)
+    if dial.optimize_layout:
+        dial.configure(**dial.best_layout(width, height))
+    fingerprint = dial.input_fingerprint()
+    stream.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    writer.start('svg', {'xmlns': SVG_NS, 'xmlns:inkscape': INKSCAPE_NS,
+                         'xmlns:sodipodi': SODIPODI_NS, 'xmlns:sundial': SUNDIAL_NS,
+                         'width': f"{width}mm", 'height': f"{height}mm",
+                         'viewBox': f"0 0 {width} {height}"})
+    # Inkscape (and sundial.py) draw into this layer when opening the file
+    writer.element(None, f"{{{SODIPODI_NS}}}namedview", {'id': "namedview1",
+                                                            inkscape_attr('current-layer'): "layer1"})
+    writer.start('g', {'id': "layer1",
+                       inkscape_attr('groupmode'): "layer",
+                       inkscape_attr('label'): "Layer 1"})
+    writer.start('g', {'id': "sundial",
+                       inkscape_attr('label'): "Sundial",
+                       sundial_attr("params"): json.dumps(dial.dial_params(), sort_keys=True),
+                       sundial_attr("input"): fingerprint})
+    curves = None
+    for name, key, draw in dial.parts(fingerprint):
+        if curves is None and name != "template":
+            curves = dial.collect_curves()
+        writer.start('g', dial.start_part("sundial", name, key))
+        with dial.stats.stage(f"emit_{name}"):
+            draw(None, curves)
+            if dial.css_classes:
+                dial.write_styles(None)
+        writer.end('g')
+    writer.end('g')
+    writer.end('g')
+    writer.end('svg')
+    dial.stats.count("elements", writer.elements)
+    return dial
@@ -0,0 +1,74 @@
+import pytest
+
+from sundial_core import (SundialCore, box_crossings, split_at_cuts,
+                          FACE_FLAT, FACE_TOP, FACE_LEFT, FACE_BOTTOM)
+
+OX, OY, FLAT, LENGTH = 145, 150, 105, 29
+BOX = (OX, OY, FLAT, LENGTH)
+
+
+def test_fold_vertex_on_the_fold_line():
+    # straight up from the flat bottom over the top fold
+    vertices = box_crossings((OX - 10, OY - FLAT + 5), (OX - 10, OY - FLAT - 5), FACE_FLAT, BOX)
+    assert vertices == [(OX - 10, OY - FLAT, FACE_TOP)]
+    vertices = box_crossings((OX - FLAT + 3, OY + 20), (OX - FLAT - 3, OY + 20), FACE_FLAT, BOX)
+    assert vertices == [(OX - FLAT, OY + 20, FACE_LEFT)]
+
+
+def test_corner_cut_is_symmetric():
+    # across the diagonal through the top left corner, from the top to the left side
+    vertices = box_crossings((OX - FLAT - 10, OY - FLAT - 12), (OX - FLAT - 12, OY - FLAT - 10),
+                             FACE_TOP, BOX)
+    (x1, y1, f1), (x2, y2, f2) = vertices
+    assert (f1, f2) == (FACE_TOP, FACE_LEFT)
+    assert x1 == pytest.approx(OX - FLAT) and y2 == pytest.approx(OY - FLAT)
+    # same height on both sides of the cut
+    assert (OY - FLAT) - y1 == pytest.approx((OX - FLAT) - x2)
+    assert 0 < (OY - FLAT) - y1 < LENGTH
+
+
+@pytest.fixture
+def box_curves(tmp_path, monkeypatch):
+    monkeypatch.setenv("SUNDIAL_CACHE", str(tmp_path))
+    dial = SundialCore(source="compute", year=2021, step=10, box_mode=True,
+                       length=LENGTH, offset_x=OX, offset_y=OY, bounding_box=FLAT + LENGTH)
+    return dial.collect_curves()
+
+
+def lines(curves):
+    return list(curves.months.values()) + [path for hours in (curves.hours_summer1, curves.hours_winter,
+                                                              curves.hours_summer2)
+                                           for path in hours.values()]
+
+
+def test_lines_are_clipped_at_every_fold(box_curves):
+    fold_lines = {FACE_TOP: (1, OY - FLAT), FACE_BOTTOM: (1, OY + FLAT), FACE_LEFT: (0, OX - FLAT)}
+    folds = cuts = 0
+    for path in lines(box_curves):
+        for a, b in zip(path, path[1:]):
+            if a[2] == b[2]:
+                continue
+            if FACE_FLAT in (a[2], b[2]):
+                folds += 1
+                side = a[2] if a[2] != FACE_FLAT else b[2]
+                axis, value = fold_lines[side]
+                # the vertex on the fold is the point entering the new face
+                assert b[axis] == pytest.approx(value, abs=1e-9)
+            else:
+                cuts += 1
+                side, left = (a, b) if b[2] == FACE_LEFT else (b, a)
+                edge_y = OY - FLAT if side[2] == FACE_TOP else OY + FLAT
+                assert side[0] == pytest.approx(OX - FLAT)
+                assert left[1] == pytest.approx(edge_y)
+                assert abs(side[1] - edge_y) == pytest.approx((OX - FLAT) - left[0])
+    assert folds and cuts
+
+
+def test_month_lines_on_the_sides(box_curves):
+    faces = {p[2] for path in box_curves.months.values() for p in path}
+    assert faces == {FACE_FLAT, FACE_TOP, FACE_LEFT, FACE_BOTTOM}
+
+
+def test_split_at_cuts():
+    path = [(0, 0, FACE_FLAT), (1, 0, FACE_TOP), (2, 0, FACE_LEFT), (3, 0, FACE_LEFT)]
+    assert split_at_cuts(path) == [path[:2], path[2:]]
@@ -0,0 +1,50 @@
+import datetime
+
+import pytest
+
+from sundial_core import SundialCore, sun_path
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("SUNDIAL_CACHE", str(tmp_path))
+
+
+def write_csv(path, first):
+    """A sunearthtools like CSV of 2021 from the date first on."""
+    dates, times, el, az = sun_path(48.2, 16.37, 1.0, 2021, 60)
+    with open(path, "w") as f:
+        f.write("coo: 48.2 16.37;" + ";".join(f"E {t};A {t}" for t in times) + "\n")
+        for i, date in enumerate(dates):
+            if date >= first:
+                f.write(date.isoformat() + ";" + ";".join(
+                    f"{e:.2f};{a:.2f}" if e == e else ";" for e, a in zip(el[i], az[i])) + "\n")
+    return str(path)
+
+
+def test_winter_solstice_on_the_last_day():
+    curves = SundialCore(source="compute", year=2021, step=30,
+                         solstice_winter="12-31").collect_curves()
+    assert curves.hours_summer2 == {}
+    assert curves.hours_winter and curves.hours_summer1
+
+
+@pytest.mark.parametrize("multi_year", ["first", "overlay"])
+def test_table_starting_after_the_summer_solstice(tmp_path, multi_year):
+    path = write_csv(tmp_path / "sun.csv", datetime.date(2021, 7, 15))
+    curves = SundialCore(csvfile=path, multi_year=multi_year).collect_curves()
+    assert curves.hours_summer1 == {}
+    assert curves.hours_winter and curves.hours_summer2
+    assert sorted(curves.months) == [8, 9, 10, 11, 12]
+
+
+def test_day_curve():
+    dial = SundialCore(source="compute", year=2021, step=30)
+    gps_coords, dates, times, el, az = dial.load_table()
+    grid = dial.sun_grid(dates, times, el, az)
+    date = datetime.date(2021, 3, 1)
+    curve = grid.day_curve(date)
+    assert len(curve) == len(grid.day_slots(dates.index(date)))
+    assert curve == dial.collect_curves().months[3]
+    assert grid.day_curve(datetime.date(2022, 1, 1)) == []
+    assert grid.day_curve(datetime.date(2020, 12, 31)) == []
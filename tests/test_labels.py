@@ -0,0 +1,41 @@
+import random
+
+import numpy as np
+
+from sundial_core import LabelIndex, segments_in_box
+
+
+def test_line_between_samples_is_found():
+    # samples of the line would be 1 apart, the box is only 0.5 high
+    index = LabelIndex(2)
+    index.add_line([(0, 0), (0, 10)])
+    assert index.cost((-1, 1.2, 1, 1.7)) > 0
+
+
+def test_line_through_box_corner_is_found():
+    index = LabelIndex(2)
+    index.add_line([(-10, 9.6), (10, -10.4)])
+    assert index.cost((0, -1, 0.5, 0)) > 0
+
+
+def test_line_next_to_box_costs_nothing():
+    index = LabelIndex(2)
+    index.add_line([(0, 0), (0, 10)])
+    assert index.cost((0.1, 1, 3, 3)) == 0
+
+
+def test_cost_matches_exact_test():
+    rng = random.Random(1)
+    index = LabelIndex(1.5)
+    paths = []
+    for _ in range(20):
+        path = [(rng.uniform(0, 50), rng.uniform(0, 50)) for _ in range(5)]
+        index.add_line(path)
+        paths.append(path)
+    for _ in range(200):
+        x = rng.uniform(0, 50)
+        y = rng.uniform(0, 50)
+        box = (x, y, x + rng.uniform(0.1, 5), y + rng.uniform(0.1, 1))
+        crossing = any(segments_in_box(np.array([[*a, *b] for a, b in zip(p, p[1:])]), box).any()
+                       for p in paths)
+        assert (index.cost(box) > 0) == crossing
@@ -0,0 +1,60 @@
+import io
+import re
+
+import numpy as np
+import pytest
+from lxml import etree
+
+from sundial_core import SundialCore, DialError
+from sundial_svg import SVG_NS, write_svg
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("SUNDIAL_CACHE", str(tmp_path))
+
+
+PARAMS = dict(source="compute", year=2021, step=30, optimize_layout=True)
+
+
+def drawn_points(svg):
+    """(x, y) of every path vertex, circle and text anchor of the document."""
+    root = etree.fromstring(svg.encode())
+    points = []
+    for path in root.iter(f"{{{SVG_NS}}}path"):
+        points += [(float(x), float(y)) for x, y in re.findall(r"(-?[\d.e+-]+),(-?[\d.e+-]+)", path.get("d"))]
+    for circle in root.iter(f"{{{SVG_NS}}}circle"):
+        points.append((float(circle.get("cx")), float(circle.get("cy"))))
+    for text in root.iter(f"{{{SVG_NS}}}text"):
+        if text.get("x") is not None:
+            points.append((float(text.get("x")), float(text.get("y"))))
+        else:
+            x, y = re.match(r"translate\(([^,]+),([^)]+)\)", text.get("transform")).groups()
+            points.append((float(x), float(y)))
+    return np.array(points)
+
+
+@pytest.mark.parametrize("width,height", [(297, 420), (210, 297), (297, 210), (148, 105)])
+@pytest.mark.parametrize("params", [{}, {"box_mode": True}, {"projection": "vertical"}])
+def test_dial_fits_on_the_page(width, height, params):
+    stream = io.StringIO()
+    dial = write_svg(stream, width=width, height=height, **PARAMS, **params)
+    points = drawn_points(stream.getvalue())
+    assert len(points) > 100
+    assert points[:, 0].min() >= 0 and points[:, 0].max() <= width
+    assert points[:, 1].min() >= 0 and points[:, 1].max() <= height
+    # and uses the page
+    span = points.max(axis=0) - points.min(axis=0)
+    assert max(span[0] / width, span[1] / height) > 0.5
+    assert dial.bounding_box > dial.length
+
+
+def test_larger_page_larger_dial():
+    small = SundialCore(**PARAMS).best_layout(148, 105)
+    large = SundialCore(**PARAMS).best_layout(297, 420)
+    assert large["length"] > small["length"]
+
+
+def test_no_room():
+    with pytest.raises(DialError):
+        SundialCore(**PARAMS).best_layout(20, 20)
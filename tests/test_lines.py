@@ -0,0 +1,48 @@
+import math
+
+import numpy as np
+
+from sundial_core import simplify_polyline, fit_cubic_beziers
+
+
+def wave(n=200):
+    return [(i * 0.5, 10 * math.sin(i / 15), i % 4) for i in range(n)]
+
+
+def distance_to_polyline(p, line):
+    a = line[:-1]
+    d = line[1:] - a
+    t = np.clip(np.sum((p - a) * d, axis=1) / np.maximum(np.sum(d * d, axis=1), 1e-12), 0, 1)
+    return np.min(np.hypot(*(a + d * t[:, np.newaxis] - p).T))
+
+
+def test_simplify_keeps_ends_and_keep_points():
+    points = wave()
+    simple = simplify_polyline(points, 0.5, keep=(17, 123))
+    assert simple[0] == points[0] and simple[-1] == points[-1]
+    assert points[17] in simple and points[123] in simple
+    assert len(simple) < len(points) / 4
+
+
+def test_simplify_stays_within_tolerance():
+    points = wave()
+    simple = np.array([p[:2] for p in simplify_polyline(points, 0.2)])
+    assert max(distance_to_polyline(np.array(p[:2]), simple) for p in points) <= 0.2 + 1e-9
+
+
+def test_simplify_off():
+    points = wave(10)
+    assert simplify_polyline(points, 0) == points
+
+
+def test_beziers_stay_within_tolerance():
+    points = wave()
+    curves = fit_cubic_beziers(points, 0.05)
+    u = np.linspace(0, 1, 400)[:, np.newaxis]
+    basis = np.hstack(((1 - u)**3, 3 * (1 - u)**2 * u, 3 * (1 - u) * u**2, u**3))
+    sampled = np.vstack([basis @ c for c in curves])
+    assert max(distance_to_polyline(np.array(p[:2]), sampled) for p in points) <= 0.05 + 1e-3
+    # joined end to end
+    for a, b in zip(curves, curves[1:]):
+        assert np.allclose(a[3], b[0])
+    assert np.allclose(curves[0][0], points[0][:2]) and np.allclose(curves[-1][3], points[-1][:2])
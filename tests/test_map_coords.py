@@ -0,0 +1,62 @@
+import math
+
+import numpy as np
+import pytest
+
+from sundial_core import SundialCore, FACE_FLAT, FACE_TOP, FACE_LEFT, FACE_BOTTOM
+
+
+def scalar_map_coords(dial, length, el, az, box_mode):
+    """Sundial.map_coords() before the batched projection."""
+    el_rad = (el / 180.0) * math.pi
+    az_rad = (az / 180.0) * math.pi
+    d = length / math.tan(el_rad)
+    x = math.cos(az_rad) * d + dial.offset_x
+    y = math.sin(az_rad) * d + dial.offset_y
+    if box_mode:
+        flat_size = dial.bounding_box - dial.length
+        if y < (dial.offset_y - flat_size):
+            x_out = (1/math.tan(az_rad)) * flat_size
+            d2 = math.sqrt(math.pow(x_out,2) + math.pow(flat_size,2))
+            y_out = length - math.tan(el_rad) * d2
+            y = dial.offset_y - flat_size - y_out
+            x = dial.offset_x - x_out
+        if x < dial.offset_x - flat_size:
+            y_out = math.tan(az_rad) * flat_size
+            d2 = math.sqrt(math.pow(y_out,2) + math.pow(flat_size,2))
+            x_out = length - math.tan(el_rad) * d2
+            y = dial.offset_y - y_out
+            x = dial.offset_x - flat_size - x_out
+        if y > (dial.offset_y + flat_size):
+            x_out = (1/math.tan(az_rad)) * flat_size
+            d2 = math.sqrt(math.pow(x_out,2) + math.pow(flat_size,2))
+            y_out = length - math.tan(el_rad) * d2
+            y = dial.offset_y + flat_size + y_out
+            x = dial.offset_x + x_out
+    return (x, y)
+
+
+def sun_positions():
+    el, az = np.meshgrid(np.arange(2.0, 70.0, 3.0), np.arange(45.0, 316.0, 5.0))
+    return el.ravel(), az.ravel()
+
+
+@pytest.mark.parametrize("box_mode", [False, True])
+def test_batch_matches_scalar(box_mode):
+    dial = SundialCore(length=27, bounding_box=130, box_mode=box_mode)
+    el, az = sun_positions()
+    x, y, face = dial.map_coords_batch(dial.length, el, az)
+    expected = np.array([scalar_map_coords(dial, dial.length, e, a, box_mode)
+                         for e, a in zip(el.tolist(), az.tolist())])
+    np.testing.assert_allclose(x, expected[:, 0], rtol=1e-12, atol=1e-9)
+    np.testing.assert_allclose(y, expected[:, 1], rtol=1e-12, atol=1e-9)
+    if box_mode:
+        assert set(face.tolist()) == {FACE_FLAT, FACE_TOP, FACE_LEFT, FACE_BOTTOM}
+    else:
+        assert set(face.tolist()) == {FACE_FLAT}
+
+
+def test_scalar_wrapper():
+    dial = SundialCore(box_mode=True)
+    assert dial.map_coords(dial.length, 20.0, 250.0) == \
+        pytest.approx(scalar_map_coords(dial, dial.length, 20.0, 250.0, True))
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from sundial_core import SundialCore, sun_path, load_csv
+
+
+def write_csv(path, years, step=60, first=None):
+    """A sunearthtools like CSV of sun_path() for the years, from date first on."""
+    with open(path, "w") as f:
+        for n, year in enumerate(years):
+            dates, times, el, az = sun_path(48.2, 16.37, 1.0, year, step)
+            if n == 0:
+                f.write("coo: 48.2 16.37;" + ";".join(f"E {t};A {t}" for t in times) + "\n")
+            for i, date in enumerate(dates):
+                if first is not None and date < first:
+                    continue
+                cells = [f"{e:.2f};{a:.2f}" if not np.isnan(e) else ";"
+                         for e, a in zip(el[i].tolist(), az[i].tolist())]
+                f.write(date.isoformat() + ";" + ";".join(cells) + "\n")
+    return str(path)
+
+
+def curves(path, **params):
+    return SundialCore(csvfile=path, **params).collect_curves()
+
+
+def test_overlay_draws_every_year(tmp_path):
+    path = write_csv(tmp_path / "sun.csv", [2020, 2021, 2022])
+    result = curves(path, multi_year="overlay")
+    assert result.year == 2020
+    assert [c.year for c in result.overlays] == [2021, 2022]
+    assert sorted(result.overlays[0].months) == list(range(1, 13))
+
+
+def test_first_year_only(tmp_path):
+    path = write_csv(tmp_path / "sun.csv", [2020, 2021])
+    result = curves(path, multi_year="first")
+    assert result.year == 2020 and not result.overlays
+
+
+def test_average_of_the_same_year_is_that_year(tmp_path):
+    one = write_csv(tmp_path / "one.csv", [2021])
+    three = write_csv(tmp_path / "three.csv", [2021, 2021, 2021])
+    expected = curves(one)
+    result = curves(three, multi_year="average")
+    assert not result.overlays
+    assert sorted(result.hours_winter) == sorted(expected.hours_winter)
+    for hour, line in expected.hours_winter.items():
+        np.testing.assert_allclose(np.array(result.hours_winter[hour]), np.array(line), atol=1e-3)
+
+
+def test_average_is_between_the_years(tmp_path):
+    path = write_csv(tmp_path / "sun.csv", [2020, 2021])
+    result = curves(path, multi_year="average")
+    years = [curves(write_csv(tmp_path / f"{y}.csv", [y])) for y in (2020, 2021)]
+    noon = result.hours_winter["12:00"]
+    a, b = (np.array(y.hours_winter["12:00"]) for y in years)
+    n = min(len(noon), len(a), len(b))
+    lo = np.minimum(a[:n, :2], b[:n, :2]) - 1e-3
+    hi = np.maximum(a[:n, :2], b[:n, :2]) + 1e-3
+    assert np.all((np.array(noon)[:n, :2] >= lo) & (np.array(noon)[:n, :2] <= hi))
+
+
+@pytest.mark.parametrize("multi_year", ["first", "overlay", "average"])
+def test_header_only_csv(tmp_path, multi_year):
+    path = tmp_path / "sun.csv"
+    path.write_text("coo: 48.2 16.37;E 12:00:00;A 12:00:00\n")
+    result = curves(str(path), multi_year=multi_year)
+    assert result.gps_coords == "48.2 16.37"
+    assert not result.months and not result.hours_winter and not result.overlays
+
+
+def test_table_is_memory_mapped(tmp_path):
+    path = write_csv(tmp_path / "sun.csv", [2021])
+    for _ in range(2):
+        gps, dates, times, el, az = load_csv(path)
+        assert isinstance(el.base, np.memmap)
+        assert el.shape == (365, 24)
@@ -0,0 +1,87 @@
+import math
+
+import numpy as np
+import pytest
+
+from sundial_core import SundialCore, PROJECTIONS, DialError
+
+LATITUDE = 48.2
+LENGTH = 20
+
+
+def sun(hour_angle, declination, latitude=LATITUDE):
+    """Elevation and azimuth (degrees) of the sun at an hour angle and declination."""
+    h = math.radians(hour_angle)
+    d = math.radians(declination)
+    lat = math.radians(latitude)
+    east = -math.cos(d) * math.sin(h)
+    north = math.cos(lat) * math.sin(d) - math.sin(lat) * math.cos(d) * math.cos(h)
+    up = math.sin(lat) * math.sin(d) + math.cos(lat) * math.cos(d) * math.cos(h)
+    return math.degrees(math.asin(up)), math.degrees(math.atan2(east, north)) % 360
+
+
+def hour_line(projection, hour_angle, **params):
+    """Direction of the hour line, from declination -15 to +15 degrees."""
+    dial = SundialCore(projection=projection, length=LENGTH, **params)
+    el, az = zip(*[sun(hour_angle, d) for d in (-15, 15)])
+    x, y, _ = dial.map_coords_batch(LENGTH, el, az, latitude=LATITUDE)
+    return np.array([x[1] - x[0], y[1] - y[0]]), (x, y)
+
+
+def angle(a, b):
+    return math.degrees(math.atan2(abs(a[0] * b[1] - a[1] * b[0]), a @ b))
+
+
+def test_all_kernels_registered():
+    assert set(PROJECTIONS) == {"horizontal", "vertical", "polar", "equatorial"}
+
+
+@pytest.mark.parametrize("hour_angle", [-45, -15, 30, 60])
+def test_horizontal_hour_lines(hour_angle):
+    noon, _ = hour_line("horizontal", 0)
+    line, _ = hour_line("horizontal", hour_angle)
+    expected = math.degrees(math.atan(math.sin(math.radians(LATITUDE)) * math.tan(math.radians(abs(hour_angle)))))
+    assert angle(noon, line) == pytest.approx(expected, abs=1e-6)
+
+
+@pytest.mark.parametrize("hour_angle", [-45, -15, 30, 60])
+def test_vertical_south_wall_hour_lines(hour_angle):
+    noon, _ = hour_line("vertical", 0, wall_azimuth=180.0)
+    line, _ = hour_line("vertical", hour_angle, wall_azimuth=180.0)
+    expected = math.degrees(math.atan(math.cos(math.radians(LATITUDE)) * math.tan(math.radians(abs(hour_angle)))))
+    assert angle(noon, line) == pytest.approx(expected, abs=1e-6)
+    # the noon line is vertical on the wall
+    assert noon[0] == pytest.approx(0, abs=1e-9)
+
+
+@pytest.mark.parametrize("hour_angle", [-45, -15, 30, 60])
+def test_polar_hour_lines_are_parallel(hour_angle):
+    line, (x, y) = hour_line("polar", hour_angle)
+    assert line[0] == pytest.approx(0, abs=1e-9)
+    assert x[0] - 150 == pytest.approx(LENGTH * math.tan(math.radians(hour_angle)))
+
+
+@pytest.mark.parametrize("hour_angle", [-90, -45, 30, 75])
+def test_equatorial_hour_lines_are_evenly_spaced(hour_angle):
+    line, (x, y) = hour_line("equatorial", hour_angle)
+    assert line[0] == pytest.approx(0, abs=1e-9)
+    assert x[0] - 150 == pytest.approx(LENGTH * math.radians(hour_angle))
+    assert y[1] - 150 == pytest.approx(LENGTH * math.tan(math.radians(15)))
+
+
+def test_wall_only_gets_the_sun_in_front():
+    dial = SundialCore(projection="vertical", wall_azimuth=180.0)
+    # the sun in the north east early in the morning of the summer
+    x, y, _ = dial.map_coords_batch(dial.length, [10.0], [60.0])
+    assert np.isnan(x[0]) and np.isnan(y[0])
+
+
+@pytest.mark.parametrize("projection", ["polar", "equatorial"])
+def test_no_latitude_in_the_data(tmp_path, projection):
+    path = tmp_path / "sun.csv"
+    path.write_text("coo: somewhere;E 12:00:00;A 12:00:00\n2021-01-01;18.0;180.0\n")
+    dial = SundialCore(csvfile=str(path), projection=projection)
+    with pytest.raises(DialError, match="latitude"):
+        dial.collect_curves()
+    # not needed by the flat dials
+    assert SundialCore(csvfile=str(path)).dial_latitude() is None
@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+
+import sundial_core
+from sundial_core import SIDECAR_SUFFIX, load_csv
+
+
+def write_csv(path, elevation=10.0):
+    with open(path, "w") as f:
+        f.write("coo: 48.2 16.37;A 09:00:00;E 09:00:00;A 12:00:00;E 12:00:00\n")
+        f.write(f"2021-01-01;130.00;{elevation:.2f};180.00;18.00\n")
+        f.write(f"2021-01-02;130.00;{elevation:.2f};180.00;18.10\n")
+
+
+def test_sidecar_is_used(tmp_path):
+    path = str(tmp_path / "sun.csv")
+    write_csv(path)
+    first = load_csv(path)
+    assert os.path.exists(path + SIDECAR_SUFFIX)
+    second = load_csv(path)
+    assert isinstance(second[3], np.memmap)
+    assert second[0] == first[0] == "48.2 16.37"
+    assert np.array_equal(second[3], first[3])
+
+
+def test_sidecar_invalidated_by_content_change(tmp_path):
+    path = str(tmp_path / "sun.csv")
+    write_csv(path, elevation=10.0)
+    load_csv(path)
+    st = os.stat(path)
+    # same size and mtime, only the hash tells the difference
+    write_csv(path, elevation=20.0)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+    assert load_csv(path)[3][0, 0] == 20.0
+
+
+def test_touched_csv_is_hashed_only_once(tmp_path, monkeypatch):
+    path = str(tmp_path / "sun.csv")
+    write_csv(path)
+    load_csv(path)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    load_csv(path)
+
+    def no_hashing(path):
+        raise AssertionError("hashed again")
+    monkeypatch.setattr(sundial_core, "file_digest", no_hashing)
+    assert load_csv(path)[3][0, 0] == 10.0
+
+
+def test_foreign_sidecar_files_are_kept(tmp_path, monkeypatch):
+    foreign = tmp_path / "notes.sundial"
+    foreign.write_bytes(b"not ours" * 1000)
+    path = str(tmp_path / "sun.csv")
+    write_csv(path)
+    monkeypatch.setattr(sundial_core, "CACHE_MAX_BYTES", 0)
+    load_csv(path)
+    assert foreign.exists()
+    # our own sidecar is the only one over the limit
+    assert not os.path.exists(path + SIDECAR_SUFFIX)
+
+
+def test_fingerprint_taken_from_the_sidecar(tmp_path, monkeypatch):
+    path = str(tmp_path / "sun.csv")
+    write_csv(path)
+    dial = sundial_core.SundialCore(csvfile=path)
+    before = dial.input_fingerprint()
+    load_csv(path)
+
+    def no_hashing(path):
+        raise AssertionError("hashed again")
+    monkeypatch.setattr(sundial_core, "file_digest", no_hashing)
+    assert dial.input_fingerprint() == before
@@ -0,0 +1,76 @@
+import datetime
+import math
+
+import numpy as np
+
+import sundial_core
+from sundial_core import sun_position, sun_path, cached_sun_path
+
+
+def noon(latitude, longitude, timezone, date):
+    """(minute, elevation) of the highest sun of the day, to 1/10 minute."""
+    minutes = np.arange(9 * 60, 15 * 60, 0.1)
+    el, az = sun_position(latitude, longitude, timezone, date.toordinal(), minutes)
+    i = int(np.argmax(el))
+    return minutes[i], el[i]
+
+
+def refracted(elevation):
+    return elevation + 58.1 / math.tan(math.radians(elevation)) / 3600
+
+
+def test_noon_elevation_at_the_solstices():
+    # 90 - latitude +/- 23.44 (obliquity) plus the refraction
+    _, summer = noon(48.2, 16.37, 1, datetime.date(2021, 6, 21))
+    _, winter = noon(48.2, 16.37, 1, datetime.date(2021, 12, 21))
+    assert abs(summer - refracted(90 - 48.2 + 23.44)) < 0.02
+    assert abs(winter - refracted(90 - 48.2 - 23.44)) < 0.02
+
+
+def test_equation_of_time():
+    # NOAA: the equation of time is +16.4 min on November 3 and -14.2 min on
+    # February 11, on the meridian of the time zone noon moves by that
+    minute, _ = noon(0.0, 15.0, 1, datetime.date(2021, 11, 3))
+    assert abs(minute - (12 * 60 - 16.4)) < 0.3
+    minute, _ = noon(0.0, 15.0, 1, datetime.date(2021, 2, 11))
+    assert abs(minute - (12 * 60 + 14.2)) < 0.3
+
+
+def test_azimuth_at_noon_is_south():
+    minute, _ = noon(48.2, 16.37, 1, datetime.date(2021, 3, 20))
+    el, az = sun_position(48.2, 16.37, 1, datetime.date(2021, 3, 20).toordinal(), minute)
+    assert abs(az - 180) < 0.1
+
+
+def test_sun_path_table():
+    dates, times, el, az = sun_path(48.2, 16.37, 1, 2021, 60)
+    assert len(dates) == 365 and len(times) == 24
+    assert times[12] == "12:00:00"
+    # below the horizon is NaN
+    assert np.isnan(el[0, 0]) and not np.isnan(el[0, 12])
+
+
+def cache_files(tmp_path):
+    return sorted(p.name for p in tmp_path.iterdir())
+
+
+def test_broken_cache_file_is_replaced(tmp_path, monkeypatch):
+    monkeypatch.setenv("SUNDIAL_CACHE", str(tmp_path))
+    expected = cached_sun_path(48.2, 16.37, 1.0, 2021, 30)
+    name, = cache_files(tmp_path)
+    (tmp_path / name).write_bytes(b"PK\x03\x04garbage")
+    dates, times, el, az = cached_sun_path(48.2, 16.37, 1.0, 2021, 30)
+    np.testing.assert_array_equal(el, expected[2])
+    assert dates == expected[0] and times == expected[1]
+    # written again
+    assert (tmp_path / name).read_bytes()[:4] == b"PK\x03\x04"
+    assert len((tmp_path / name).read_bytes()) > 100
+
+
+def test_eviction_keeps_other_files(tmp_path, monkeypatch):
+    monkeypatch.setenv("SUNDIAL_CACHE", str(tmp_path))
+    monkeypatch.setattr(sundial_core, "CACHE_MAX_BYTES", 1)
+    (tmp_path / "my_data.npz").write_bytes(b"x" * 1000)
+    cached_sun_path(48.2, 16.37, 1.0, 2021, 30)
+    cached_sun_path(48.2, 16.37, 1.0, 2022, 30)
+    assert cache_files(tmp_path) == ["my_data.npz"]
@@ -0,0 +1,51 @@
+import io
+
+import pytest
+from lxml import etree
+
+from sundial_svg import SVG_NS, SUNDIAL_NS, SundialDrawing, TreeWriter, write_svg
+
+
+PARAMS = dict(source="compute", year=2021, step=30, place_labels=True)
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("SUNDIAL_CACHE", str(tmp_path))
+
+
+def tree_parts(**params):
+    """{part: its group} drawn with the TreeWriter like sundial.py does."""
+    dial = SundialDrawing(TreeWriter(), **params)
+    fingerprint = dial.input_fingerprint()
+    root = etree.Element(f"{{{SVG_NS}}}g")
+    curves = dial.collect_curves()
+    parts = {}
+    for name, key, draw in dial.parts(fingerprint):
+        group = etree.SubElement(root, f"{{{SVG_NS}}}g", dial.start_part("sundial", name, key))
+        draw(group, curves)
+        if dial.css_classes:
+            dial.write_styles(group)
+        parts[name] = group
+    return parts
+
+
+def elements(group):
+    return [(e.tag, dict(e.attrib), e.text) for e in group.iterdescendants()]
+
+
+@pytest.mark.parametrize("params", [{}, {"box_mode": True, "css_classes": True},
+                                    {"bezier": True, "sundial_type": "winter_to_summer_only"}])
+def test_stream_matches_tree(params):
+    stream = io.StringIO()
+    write_svg(stream, **PARAMS, **params)
+    root = etree.fromstring(stream.getvalue().encode())
+    assert root.tag == f"{{{SVG_NS}}}svg"
+    part = f"{{{SUNDIAL_NS}}}part"
+    streamed = {g.get(part): g for g in root.iter(f"{{{SVG_NS}}}g") if g.get(part)}
+    expected = tree_parts(**PARAMS, **params)
+    assert list(streamed) == list(expected)
+    for name, group in expected.items():
+        assert dict(streamed[name].attrib) == dict(group.attrib)
+        assert elements(streamed[name]) == elements(group), name
+    assert len(elements(expected["hours"])) > 50